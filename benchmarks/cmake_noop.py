@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Compares the no-op and incremental build times of the Makefile and the Ninja
+# generator (as used by tools/cmake) on a generated sample project.
+#
+# Usage: python benchmarks/cmake_noop.py [--sources N] [--runs N]
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+def createProject(path, libraries, sources):
+	"""Creates a project with several libraries and sources"""
+	with open(os.path.join(path, 'CMakeLists.txt'), 'w') as f:
+		f.write('cmake_minimum_required(VERSION 3.5)\nproject(noop C)\n')
+		for l in range(libraries):
+			names = []
+			for s in range(sources):
+				name = 'l%d_s%d.c' % (l, s)
+				with open(os.path.join(path, name), 'w') as src:
+					src.write('int f_%d_%d(int x) { return x + %d; }\n' % (l, s, s))
+				names.append(name)
+			f.write('add_library(l%d %s)\n' % (l, ' '.join(names)))
+
+def run(cmd, cwd):
+	subprocess.check_call(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+def timeBuild(buildDir, runs):
+	"""Returns the minimal time of runs builds"""
+	times = []
+	for i in range(runs):
+		start = time.time()
+		run(['cmake', '--build', '.', '--', '-j', '4'], buildDir)
+		times.append(time.time() - start)
+	return min(times)
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--libraries', type=int, default=20)
+	parser.add_argument('--sources', type=int, default=50)
+	parser.add_argument('--runs', type=int, default=5)
+	args = parser.parse_args()
+
+	generators = ['Unix Makefiles']
+	if shutil.which('ninja'):
+		generators.append('Ninja')
+	else:
+		print('ninja not found, only testing make')
+
+	tmp = tempfile.mkdtemp()
+	try:
+		project = os.path.join(tmp, 'project')
+		os.mkdir(project)
+		createProject(project, args.libraries, args.sources)
+
+		print('%-16s %10s %10s %12s' % ('generator', 'full', 'no-op', 'incremental'))
+		for gen in generators:
+			buildDir = os.path.join(tmp, gen.replace(' ', '_'))
+			os.mkdir(buildDir)
+			run(['cmake', '-G', gen, project], buildDir)
+
+			start = time.time()
+			run(['cmake', '--build', '.', '--', '-j', '4'], buildDir)
+			full = time.time() - start
+
+			noop = timeBuild(buildDir, args.runs)
+
+			# Touch a single source file before each run
+			incremental = []
+			for i in range(args.runs):
+				os.utime(os.path.join(project, 'l0_s0.c'), None)
+				incremental.append(timeBuild(buildDir, 1))
+
+			print('%-16s %9.3fs %9.3fs %11.3fs' % (gen, full, noop, min(incremental)))
+	finally:
+		shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Compares the flags of utils.pcfile with the pkg-config binary for all
+# packages in the search path. As with PKG_CONFIG_CROSSCHECK, the parsed flags
+# are compared in order ignoring duplicates (see utils.pcfile.equal(), use
+# --exact to compare the raw lists). SCons has to be in the Python path.
+#
+# Usage: python benchmarks/pkgconfig_compare.py [--exact] [--verbose]
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import SCons.Environment
+
+import utils.pcfile
+
+_options = [['--cflags'], ['--libs'], ['--static', '--libs', '--cflags']]
+
+def pkgconfig(lib, opt):
+	"""Returns the output of pkg-config or None on failure"""
+	p = subprocess.Popen(['pkg-config'] + opt + [lib], stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE, universal_newlines=True)
+	out = p.communicate()[0]
+	if p.returncode:
+		return None
+	return shlex.split(out)
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--exact', action='store_true')
+	parser.add_argument('--verbose', action='store_true')
+	args = parser.parse_args()
+
+	env = SCons.Environment.Environment(tools=[], ENV=os.environ.copy())
+
+	packages = sorted(utils.pcfile.index(env).keys())
+	mismatches = 0
+	for lib in packages:
+		for opt in _options:
+			expected = pkgconfig(lib, opt)
+			try:
+				result = utils.pcfile.flags(env, lib, opt)
+			except utils.pcfile.PcFileError as e:
+				result = None
+				if args.verbose:
+					print('%s %s: %s' % (lib, ' '.join(opt), e))
+			if args.exact or result is None or expected is None:
+				equal = result == expected
+			else:
+				equal = utils.pcfile.equal(env.ParseFlags(result), env.ParseFlags(expected))
+			if not equal:
+				mismatches += 1
+				print('%s %s:\n  pkg-config: %s\n  pcfile:     %s'
+					% (lib, ' '.join(opt), expected, result))
+
+	print('%d packages, %d option sets, %d mismatches' % (len(packages), len(_options), mismatches))
+	return 1 if mismatches else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -34,10 +34,209 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import sys
+import time
+import multiprocessing.pool
+
+import SCons.Util
+
+import utils.checks
+import utils.envstate
+import utils.findcache
+import utils.libinfo
+import utils.linkorder
+import utils.lockfile
+import utils.probe
+import utils.profile
+import utils.transaction
+
+def _finder(lib):
+	m = __import__(__name__+'.'+lib)
+	return getattr(getattr(m, lib), 'find')
+
+def _lookup(env, lib, kw):
+	"""Returns the cache key and the cache entry (or None)"""
+	if not utils.findcache.enabled(env):
+		return (None, None)
+
+	key = utils.findcache.fingerprint(env, lib, kw)
+	if utils.findcache.forced(env):
+		return (key, None)
+
+	entry = utils.findcache.lookup(env, key)
+	if entry:
+		utils.checks.display('using cached configuration for %s' % lib)
+	return (key, entry)
+
+def _store(env, key, lib, result, changes, files):
+	if key and result:
+		utils.findcache.store(env, key, lib, result, changes, files)
+
+def _locked(env, lib, kw):
+	"""Returns the LibraryInfo from the lockfile or None"""
+	locked = utils.lockfile.lookupLib(env, lib, kw)
+	if locked:
+		return utils.libinfo.LibraryInfo(lib, locked[0], locked[1], 'lockfile')
+	return None
+
+def info(env, lib, **kw):
+	"""
+	Finds the library lib, configures env accordingly and returns a
+	utils.libinfo.LibraryInfo. Results are reused for other environments
+	with the same toolchain and search pathes (see utils.libinfo).
+	Successful results are cached (see utils.findcache). Use --reconfigure
+	to ignore the cache. If the finder fails, env is not modified.
+	With --lockfile, the results are taken from (or stored in) the lockfile
+	(see utils.lockfile).
+	"""
+	if env.GetOption('help') or env.GetOption('clean'):
+		return
+
+	with utils.profile.record('libs.find(%s)' % lib, 'find') as r:
+		registryKey, libInfo = utils.libinfo.lookup(env, lib, kw)
+		if libInfo is not None:
+			libInfo.apply(env)
+			r['provenance'] = libInfo.provenance
+			return libInfo
+
+		libInfo = _locked(env, lib, kw)
+		key, entry = (None, None) if libInfo is not None else _lookup(env, lib, kw)
+		if libInfo is not None:
+			libInfo.apply(env)
+		elif entry:
+			libInfo = utils.libinfo.LibraryInfo(lib, entry['result'],
+				utils.envstate.decode(entry['changes']), 'cache')
+			libInfo.apply(env)
+			utils.lockfile.storeLib(env, lib, kw, entry['result'], libInfo.flags, entry['files'])
+		else:
+			before = utils.envstate.snapshot(env)
+
+			# Discard partial changes of unsuccessful finders
+			with utils.checks.collect() as probed, \
+					utils.profile.counting(env), \
+					utils.transaction.begin(env) as transaction:
+				utils.linkorder.begin(env)
+				result = _finder(lib)(env, **kw)
+				utils.linkorder.finalize(env)
+				if result:
+					transaction.commit()
+
+			libInfo = utils.libinfo.LibraryInfo(lib, result,
+				utils.envstate.changes(before, utils.envstate.snapshot(env)), 'probe')
+			files = utils.findcache.files(env, probed['headers'],
+				libInfo.flags.get('LIBS', []), probed['pcFiles'])
+			_store(env, key, lib, result, libInfo.flags, files)
+			utils.lockfile.storeLib(env, lib, kw, result, libInfo.flags, files)
+
+		utils.libinfo.register(registryKey, libInfo)
+		r['provenance'] = libInfo.provenance
+		return libInfo
+
 def find(env, lib, **kw):
+	"""
+	Same as info() but returns the result of the finder.
+	"""
+	libInfo = info(env, lib, **kw)
+	if libInfo is None:
+		return
+	return libInfo.result
+
+def findAll(env, libs, jobs=None):
+	"""
+	Finds several independent libraries. libs is a list of library names
+	or (name, kw) tuples. With more than one job (default: -j), the finders
+	run concurrently on copies of env using utils.probe instead of SCons
+	configure contexts. The changes are applied to env in the order of libs.
+	Returns the list of results.
+	"""
 	if env.GetOption('help') or env.GetOption('clean'):
 		return
 
-	m = __import__(__name__+'.'+lib)
-	lib_find = getattr(getattr(m, lib), 'find')
-	return lib_find(env, **kw);
\ No newline at end of file
+	libs = [(l, {}) if SCons.Util.is_String(l) else l for l in libs]
+
+	if jobs is None:
+		jobs = env.GetOption('num_jobs')
+	if jobs <= 1:
+		return [find(env, lib, **kw) for lib, kw in libs]
+
+	before = utils.envstate.snapshot(env)
+
+	tempbase = env.Dir('$CONFIGUREDIR').abspath
+	if not os.path.exists(tempbase):
+		os.makedirs(tempbase)
+
+	tasks = []
+	for lib, kw in libs:
+		registryKey, libInfo = utils.libinfo.lookup(env, lib, kw)
+		if libInfo is None:
+			libInfo = _locked(env, lib, kw)
+		key, entry = (None, None) if libInfo is not None else _lookup(env, lib, kw)
+		if entry:
+			libInfo = utils.libinfo.LibraryInfo(lib, entry['result'],
+				utils.envstate.decode(entry['changes']), 'cache')
+			utils.lockfile.storeLib(env, lib, kw, entry['result'], libInfo.flags, entry['files'])
+		task = {'lib': lib, 'kw': kw, 'registryKey': registryKey, 'key': key,
+			'info': libInfo, 'confs': [], 'output': []}
+		if libInfo is None:
+			task['env'] = env.Clone()
+			utils.probe.enable(task['env'], tempbase, task['confs'], task['output'])
+			utils.linkorder.begin(task['env'])
+		tasks.append(task)
+
+	def run(task):
+		start = time.time()
+		try:
+			with utils.checks.buffered(task['output']), \
+					utils.checks.collect() as task['probed'], \
+					utils.profile.record('libs.find(%s)' % task['lib'], 'find') as r, \
+					utils.transaction.begin(task['env']) as transaction:
+				r['provenance'] = 'probe'
+				task['result'] = _finder(task['lib'])(task['env'], **task['kw'])
+				utils.linkorder.finalize(task['env'])
+				if task['result']:
+					transaction.commit()
+		except BaseException:
+			task['exc_info'] = sys.exc_info()
+		task['time'] = time.time() - start
+
+	start = time.time()
+	pending = [t for t in tasks if t['info'] is None]
+	pool = multiprocessing.pool.ThreadPool(min(jobs, max(len(pending), 1)))
+	try:
+		pool.map(run, pending)
+	finally:
+		pool.close()
+		pool.join()
+	wallTime = time.time() - start
+
+	results = []
+	for task in tasks:
+		if task['info'] is None:
+			utils.probe.flush(env, task['confs'], task['output'])
+			if 'exc_info' in task:
+				raise task['exc_info'][1]
+			task['info'] = utils.libinfo.LibraryInfo(task['lib'], task['result'],
+				utils.envstate.changes(before, utils.envstate.snapshot(task['env'])), 'probe')
+			files = utils.findcache.files(task['env'], task['probed']['headers'],
+				task['info'].flags.get('LIBS', []), task['probed']['pcFiles'])
+			_store(task['env'], task['key'], task['lib'], task['result'], task['info'].flags, files)
+			utils.lockfile.storeLib(env, task['lib'], task['kw'], task['result'], task['info'].flags, files)
+			task['info'].apply(env)
+		else:
+			with utils.profile.record('libs.find(%s)' % task['lib'], 'find') as r:
+				r['provenance'] = task['info'].provenance
+				task['info'].apply(env)
+		utils.libinfo.register(task['registryKey'], task['info'])
+		results.append(task['info'].result)
+
+	if pending:
+		sequentialTime = sum(t['time'] for t in pending)
+		utils.checks.display('configured %d libraries in %.2fs (sequential %.2fs, speedup %.1fx)'
+			% (len(pending), wallTime, sequentialTime, sequentialTime / max(wallTime, 1e-6)))
+
+	return results
+
+def invalidate(env, lib=None):
+	"""Removes cached results for lib (or all libraries)"""
+	utils.findcache.invalidate(env, lib)
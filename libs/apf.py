@@ -54,14 +54,14 @@ def find(env, required=True, simmetrix=False, zoltan=False):
 	if simmetrix:
 		libs = simmetrixLibs + libs
 
-	for lib in libs:
-		if not conf.CheckLibWithHeader(lib[0], lib[1], 'c++'):
-			if required:
-				utils.checks.error('Could not find %s' % lib[0])
-				env.Exit(1)
-			else:
-				conf.Finish()
-				return False
+	missing = conf.CheckLibsWithHeaders(libs, 'c++')
+	if missing:
+		if required:
+			utils.checks.error('Could not find %s' % missing)
+			env.Exit(1)
+		else:
+			conf.Finish()
+			return False
 
 	conf.Finish()
 	return True
\ No newline at end of file
@@ -38,6 +38,7 @@ import utils.checks
 import utils.pkgconfig
 
 def find(env, required=True):
+  """Returns the version of Eigen (True if unknown) or False"""
   conf = env.Configure()
   utils.checks.addDefaultTests(conf)
 
@@ -46,7 +47,10 @@ def find(env, required=True):
   if flags:
     utils.pkgconfig.appendPathes(env, flags)
 
-  if not conf.CheckHeader('Eigen/Eigen', language='c++'):
+  # The version header is much cheaper than Eigen/Eigen
+  version = conf.CheckVersion('Eigen', 'Eigen/src/Core/util/Macros.h',
+    ['EIGEN_WORLD_VERSION', 'EIGEN_MAJOR_VERSION', 'EIGEN_MINOR_VERSION'], 'c++')
+  if not version and not conf.CheckHeader('Eigen/Eigen', language='c++'):
     if required:
       utils.checks.error('Could not find eigen3')
       env.Exit(1)
@@ -57,4 +61,4 @@ def find(env, required=True):
   env.Append(CPPDEFINES=['-DHAS_EIGEN3'])
 
   conf.Finish()
-  return True
+  return version or True
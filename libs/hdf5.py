@@ -36,6 +36,7 @@
 
 import utils.checks
 import utils.compiler
+import utils.macros
 import utils.pkgconfig
 
 __hdf5_api_check = """
@@ -50,15 +51,67 @@ int main(int argc, char* argv) {
 
 def CheckAPIVersion(context, api):
 	context.Message('Checking for HDF5 v%s API... ' % (api,))
-	ret = context.TryCompile(__hdf5_api_check % (api,), '.c')
+	macros = utils.macros.get(context.env)
+	if utils.macros.included(macros, 'H5pubconf.h'):
+		# Same logic as in H5version.h
+		ret = 'H5_USE_%s_API' % (api,) in macros or 'H5_USE_%s_API_DEFAULT' % (api,) in macros
+		utils.checks.fresh(context)
+	else:
+		ret = context.TryCompile(__hdf5_api_check % (api,), '.c')
 	context.Result(ret)
 
 	return ret
 
+# Features detected from H5pubconf.h
+__hdf5_features = [('parallel', 'H5_HAVE_PARALLEL'),
+	('subfiling', 'H5_HAVE_SUBFILING_VFD'),
+	('zlib', 'H5_HAVE_FILTER_DEFLATE'),
+	('szip', 'H5_HAVE_FILTER_SZIP')]
+
+__hdf5_feature_check = """
+#include <hdf5.h>
+
+#if %s
+int main(int argc, char* argv) {
+#endif
+	return 0;
+}
+"""
+
+def CheckFeatures(context):
+	"""Returns the HDF5 version (or None) and the list of features"""
+	context.Message('Checking for HDF5 features... ')
+	macros = utils.macros.get(context.env)
+	if utils.macros.included(macros, 'H5pubconf.h'):
+		utils.checks.fresh(context)
+		version = utils.macros.value(macros, 'H5_VERSION') or None
+		features = [name for name, macro in __hdf5_features if macro in macros]
+		# Collective metadata I/O is available since 1.10
+		if 'parallel' in features and version \
+				and [int(v) for v in version.split('.')[:2] if v.isdigit()] >= [1, 10]:
+			features.append('coll_metadata')
+	else:
+		version = None
+		features = [name for name, macro in __hdf5_features
+			if context.TryCompile(__hdf5_feature_check % ('defined(%s)' % macro,), '.c')]
+		if 'parallel' in features and context.TryCompile(__hdf5_feature_check
+				% ('H5_VERS_MAJOR > 1 || H5_VERS_MINOR >= 10',), '.c'):
+			features.append('coll_metadata')
+	features.sort()
+	context.Result(', '.join(features) or 'none')
+
+	return (version, features)
+
 def find(env, required=True, parallel=False, hl=True, api=18):
+	"""
+	Returns a dictionary with the version and the features (parallel,
+	coll_metadata, subfiling, zlib, szip) of HDF5 or False. For each
+	feature, HAS_HDF5_<FEATURE> is defined.
+	"""
 	conf = env.Configure()
 	utils.checks.addDefaultTests(conf)
-	conf.AddTests({'CheckAPIVersion': CheckAPIVersion})
+	conf.AddTests({'CheckAPIVersion': CheckAPIVersion,
+		'CheckFeatures': CheckFeatures})
 
 	# Find h5cc or h5pcc
 	h5ccs = ['h5cc', 'h5pcc']
@@ -108,21 +161,34 @@ def find(env, required=True, parallel=False, hl=True, api=18):
 			conf.Finish()
 			return False
 
-	if api:
-		ret = conf.CheckAPIVersion(16)
-		if api == 18 and ret:
-			# Redefine all macros
-			conf.env.Append(CPPDEFINES=['H5Dcreate_vers=2',
-				'H5Dopen_vers=2',
-				'H5Gcreate_vers=2',
-				'H5Gopen_vers=2',
-				'H5Acreate_vers=2',
-				'H5Eget_auto_vers=2',
-				'H5Eset_auto_vers=2'])
-			# TODO add more
-		elif api == 16 and not ret:
-			# Force 16 API
-			conf.env.Append(CPPDEFINES=['H5_USE_16_API'])
+	version, features = conf.CheckFeatures()
+	if parallel and 'parallel' not in features:
+		# Never link a serial HDF5 into a parallel build
+		if required:
+			utils.checks.error('HDF5 library does not support parallel I/O')
+			env.Exit(1)
+		else:
+			conf.Finish()
+			return False
+
+	# Query the API before HAS_HDF5_* changes the command line (the key of utils.macros)
+	ret = conf.CheckAPIVersion(16) if api else None
+
+	conf.env.Append(CPPDEFINES=['HAS_HDF5_'+f.upper() for f in features])
+
+	if api == 18 and ret:
+		# Redefine all macros
+		conf.env.Append(CPPDEFINES=['H5Dcreate_vers=2',
+			'H5Dopen_vers=2',
+			'H5Gcreate_vers=2',
+			'H5Gopen_vers=2',
+			'H5Acreate_vers=2',
+			'H5Eget_auto_vers=2',
+			'H5Eset_auto_vers=2'])
+		# TODO add more
+	elif api == 16 and not ret:
+		# Force 16 API
+		conf.env.Append(CPPDEFINES=['H5_USE_16_API'])
 
 	conf.Finish()
-	return True
+	return {'version': version, 'features': features}
@@ -34,11 +34,60 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import re
+
 import utils.checks
+import utils.macros
+import utils.prefixindex
+
+__metis_width_check = """
+#include <metis.h>
+
+#if %s == %d
+int main(int argc, char** argv) {
+#endif
+	return 0;
+}
+"""
+
+def _headerWidth(fileName):
+	"""Reads IDXTYPEWIDTH from a metis.h file"""
+	try:
+		with open(fileName) as f:
+			m = re.search(r'^\s*#\s*define\s+IDXTYPEWIDTH\s+(\d+)', f.read(), re.MULTILINE)
+	except IOError:
+		return None
+	return int(m.group(1)) if m else 32
+
+def CheckWidths(context):
+	"""Returns the version, IDXTYPEWIDTH and REALTYPEWIDTH of METIS"""
+	context.Message('Checking for METIS index width... ')
+	macros = utils.macros.get(context.env)
+	if utils.macros.included(macros, 'metis.h'):
+		utils.checks.fresh(context)
+		version = utils.macros.version(macros, ['METIS_VER_MAJOR', 'METIS_VER_MINOR', 'METIS_VER_SUBMINOR'])
+		# METIS 4 does not define the macros (always 32 bit)
+		widths = [utils.macros.value(macros, m) if m in macros else 32
+			for m in ['IDXTYPEWIDTH', 'REALTYPEWIDTH']]
+	else:
+		version = None
+		widths = []
+		for m in ['IDXTYPEWIDTH', 'REALTYPEWIDTH']:
+			widths.append(64 if context.TryCompile(__metis_width_check % (m, 64), '.c') else 32)
+	context.Result('%d bit (real %d bit)' % tuple(widths))
 
-def find(env, required=True, parallel=False):
+	return (version, widths[0], widths[1])
+
+def find(env, required=True, parallel=False, idx_width=None):
+	"""
+	idx_width: required IDXTYPEWIDTH (32 or 64)
+	Returns a dictionary with the version, idx_width and real_width or False.
+	The widths are defined as METIS_IDXTYPEWIDTH and METIS_REALTYPEWIDTH.
+	"""
 	conf = env.Configure()
 	utils.checks.addDefaultTests(conf)
+	conf.AddTest('CheckWidths', CheckWidths)
 
 	libs = []
 	if parallel:
@@ -54,5 +103,28 @@ def find(env, required=True, parallel=False):
 				conf.Finish()
 				return False
 
+	version, idxWidth, realWidth = conf.CheckWidths()
+	error = None
+	if idx_width and idxWidth != idx_width:
+		error = 'METIS uses %d bit indices, %d bit required' % (idxWidth, idx_width)
+	if parallel:
+		# ParMETIS is compiled with the metis.h installed next to parmetis.h
+		parmetisDir = utils.prefixindex.findHeader(env,
+			utils.prefixindex.includePathes(env, 'C'), 'parmetis.h')
+		if parmetisDir and os.path.exists(os.path.join(parmetisDir, 'metis.h')):
+			parmetisWidth = _headerWidth(os.path.join(parmetisDir, 'metis.h'))
+			if parmetisWidth and parmetisWidth != idxWidth:
+				error = 'ParMETIS uses %d bit indices, METIS %d bit' % (parmetisWidth, idxWidth)
+	if error:
+		if required:
+			utils.checks.error(error)
+			env.Exit(1)
+		else:
+			conf.Finish()
+			return False
+
+	conf.env.Append(CPPDEFINES=[('METIS_IDXTYPEWIDTH', idxWidth),
+		('METIS_REALTYPEWIDTH', realWidth)])
+
 	conf.Finish()
-	return True
\ No newline at end of file
+	return {'version': version, 'idx_width': idxWidth, 'real_width': realWidth}
@@ -34,19 +34,126 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import re
+import subprocess
+
 import utils.checks
+import utils.macros
 import utils.pkgconfig
+import utils.profile
+
+# Features reported by nc-config and the corresponding macros in netcdf_meta.h
+__netcdf_features = [('parallel4', '--has-parallel4', 'NC_HAS_PARALLEL4'),
+	('pnetcdf', '--has-pnetcdf', 'NC_HAS_PNETCDF'),
+	('szip', '--has-szlib', 'NC_HAS_SZIP')]
+
+# nc-config -> (modification time, output of nc-config --all)
+__nc_config = dict()
+
+def _ncConfig(env, ncConfig):
+	"""Runs nc-config --all once, returns the options as dictionary or None"""
+	try:
+		mtime = os.stat(ncConfig).st_mtime
+	except OSError:
+		return None
+	if ncConfig in __nc_config and __nc_config[ncConfig][0] == mtime:
+		return __nc_config[ncConfig][1]
+
+	try:
+		utils.profile.count()
+		p = subprocess.Popen([ncConfig, '--all'], env=env['ENV'],
+			stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+		out = p.communicate()[0]
+	except OSError:
+		out = ''
+		p = None
+
+	result = None
+	if p and p.returncode == 0:
+		result = dict()
+		for line in out.splitlines():
+			m = re.match(r'\s*(--[\w+-]+)\s*->\s*(.*)$', line)
+			if m:
+				result[m.group(1)] = m.group(2).strip()
+		if '--libs' not in result:
+			result = None
+
+	__nc_config[ncConfig] = (mtime, result)
+	return result
+
+def CheckNcConfig(context, ncConfig):
+	context.Message('Checking for nc-config output... ')
+	result = _ncConfig(context.env, ncConfig)
+	utils.checks.fresh(context)
+	context.Result(bool(result))
+	return result
+
+def CheckFeatures(context, config):
+	"""
+	Returns the list of features reported by nc-config (config) or
+	defined in netcdf_meta.h. Returns None if the features are unknown.
+	"""
+	context.Message('Checking for netCDF features... ')
+	utils.checks.fresh(context)
+	macros = utils.macros.get(context.env)
+	if not utils.macros.included(macros, 'netcdf_meta.h'):
+		macros = None
+
+	features = []
+	for name, option, macro in __netcdf_features:
+		if config and option in config:
+			found = config[option] == 'yes'
+		elif macros is not None:
+			found = utils.macros.value(macros, macro) == 1
+		else:
+			context.Result('unknown')
+			return None
+		if found:
+			features.append(name)
+	context.Result(', '.join(features) or 'none')
+
+	return features
 
 def find(env, required=True, parallel=False):
+	"""
+	Returns a dictionary with the version and the features (parallel4,
+	pnetcdf, szip) of netCDF or False. For each feature,
+	HAS_NETCDF_<FEATURE> is defined.
+	"""
 	conf = env.Configure()
 	utils.checks.addDefaultTests(conf)
+	conf.AddTests({'CheckNcConfig': CheckNcConfig,
+		'CheckFeatures': CheckFeatures})
 
 	flags = False
+	package = None
 	if parallel:
 		# Required for parallel netcdf on some cray machines
 		flags = utils.pkgconfig.parse(conf, 'netcdf_parallel')
+		package = 'netcdf_parallel'
 	if not flags:
 		flags = utils.pkgconfig.parse(conf, 'netcdf')
+		package = 'netcdf'
+
+	# Prefer nc-config of the installation found by pkg-config, nc-config in
+	# PATH may belong to a different (e.g. serial) installation
+	ncConfig = None
+	prefix = utils.pkgconfig.variable(env, package, 'prefix') if flags else None
+	if prefix and os.path.isfile(os.path.join(prefix, 'bin', 'nc-config')):
+		ncConfig = os.path.join(prefix, 'bin', 'nc-config')
+	else:
+		ncConfig = conf.CheckProg('nc-config')
+	config = None
+	if ncConfig:
+		config = conf.CheckNcConfig(ncConfig)
+	if config and prefix and config.get('--prefix') \
+			and os.path.realpath(config['--prefix']) != os.path.realpath(prefix):
+		utils.checks.display('ignoring %s (belongs to %s)' % (ncConfig, config['--prefix']))
+		config = None
+	if config and not flags:
+		# No .pc file
+		flags = env.ParseFlags(config.get('--cflags', '') + ' ' + config['--libs'])
 	if not flags:
 		if required:
 			utils.checks.error('Could not find netcdf with pkg-config: Make sure pkg-config is installed and PKG_CONFIG_PATH contains netcdf.pc')
@@ -70,5 +177,25 @@ def find(env, required=True, parallel=False):
 			conf.Finish()
 			return False
 
+	features = conf.CheckFeatures(config)
+	if parallel and features is not None and 'parallel4' not in features and 'pnetcdf' not in features:
+		# netcdf_par.h also exists in serial builds
+		if required:
+			utils.checks.error('netCDF library does not support parallel I/O')
+			env.Exit(1)
+		else:
+			conf.Finish()
+			return False
+	features = features or []
+	conf.env.Append(CPPDEFINES=['HAS_NETCDF_'+f.upper() for f in features])
+
+	version = None
+	if config and config.get('--version', '').startswith('netCDF '):
+		version = config['--version'][7:]
+	else:
+		macros = utils.macros.get(conf.env)
+		if utils.macros.included(macros, 'netcdf_meta.h'):
+			version = utils.macros.value(macros, 'NC_VERSION') or None
+
 	conf.Finish()
-	return True
+	return {'version': version, 'features': features}
@@ -35,6 +35,9 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import utils.checks
+import utils.macros
+import utils.symbols
+import utils.transaction
 
 # The preprocessor macro is defined as the date of the release
 # see here for release dates: http://openmp.org/wp/openmp-specifications/
@@ -45,7 +48,24 @@ __openmp_version2date = {
 	'3.0': 200803,
 	'3.1': 201107,
 	'4.0': 201307,
-	'4.5': 201511}
+	'4.5': 201511,
+	'5.0': 201811,
+	'5.1': 202011,
+	'5.2': 202111}
+
+# OpenMP flags of the compilers (identified by predefined macros)
+__openmp_flags = [
+	('__INTEL_LLVM_COMPILER', ['-qopenmp', '-fiopenmp']),
+	('__INTEL_COMPILER', ['-qopenmp', '-openmp']),
+	('__NVCOMPILER', ['-mp']),
+	('__PGI', ['-mp']),
+	('__ibmxl__', ['-qsmp=omp']),
+	('__clang__', ['-fopenmp']),
+	('__GNUC__', ['-fopenmp'])]
+__openmp_default_flags = ['-fopenmp', '-qopenmp', '-openmp', '-mp']
+
+# Shared libraries of the OpenMP runtimes
+__openmp_runtimes = ['libgomp', 'libiomp5', 'libomp', 'libnvomp']
 
 # This will only compile if OpenMP version is large enough
 __openmp_prog_src = """
@@ -56,30 +76,110 @@ int main(int argc, char** argv) {
 }
 """
 
-def __CheckOmpVersion(context, version):
-	context.Message("Checking for OpenMP v%s... " % (version,))
-	try:
-		omp_date = __openmp_version2date[version]
-	except KeyError:
-		utils.checks.error('Unknown OpenMP version %s' % (version,))
-		context.env.Exit(1)
+__openmp_runtime_src = """
+#include <omp.h>
+
+int main(int argc, char** argv) {
+	return omp_get_max_threads() > 0 ? 0 : 1;
+}
+"""
+
+def _version(date):
+	"""The latest OpenMP version released before date"""
+	versions = [v for v, d in __openmp_version2date.items() if d <= date]
+	if not versions:
+		return None
+	return max(versions, key=lambda v: __openmp_version2date[v])
+
+def _flags(macros):
+	"""OpenMP flags to try for the compiler"""
+	flags = []
+	for macro, f in __openmp_flags:
+		if macros and macro in macros:
+			flags = f
+			break
+	return flags + [f for f in __openmp_default_flags if f not in flags]
+
+def _date(context, language):
+	"""Returns _OPENMP (0 if not defined)"""
+	macros = utils.macros.get(context.env, language)
+	if macros is not None:
+		utils.checks.fresh(context)
+		if '_OPENMP' not in macros:
+			return 0
+		return utils.macros.value(macros, '_OPENMP')
 
-	ret = context.TryCompile(__openmp_prog_src % (omp_date,), '.c')
-	context.Result(ret)
+	# Preprocessor does not support -dM
+	suffix = '.cpp' if language == 'C++' else '.c'
+	for date in sorted(__openmp_version2date.values(), reverse=True):
+		if context.TryCompile(__openmp_prog_src % (date,), suffix):
+			return date
+	return 0
 
-	return ret
+def __CheckOpenMP(context, language):
+	"""Finds the OpenMP flag of the compiler, returns (flag, date) or None"""
+	context.Message("Checking for %s OpenMP flag... " % (language,))
+
+	flagsVar = 'CXXFLAGS' if language == 'C++' else 'CFLAGS'
+	result = None
+	for flag in _flags(utils.macros.get(context.env, language)):
+		with utils.transaction.begin(context.env):
+			context.env.Append(**{flagsVar: [flag]})
+			date = _date(context, language)
+		if date:
+			result = (flag, date)
+			break
+
+	if result:
+		context.Result('%s (OpenMP %s, %d)' % (result[0], _version(result[1]), result[1]))
+	else:
+		context.Result(False)
+	return result
+
+def __CheckOmpRuntime(context):
+	"""Links an OpenMP program, returns the runtime library (or 'unknown') or None"""
+	context.Message("Checking for OpenMP runtime... ")
+	if not context.TryLink(__openmp_runtime_src, '.c'):
+		context.Result(False)
+		return None
+
+	target = context.lastTarget
+	info = utils.symbols.parse(getattr(target, 'abspath', str(target)))
+	runtime = 'unknown'
+	if info and info['type'] == 'elf':
+		for lib in info['needed']:
+			for name in __openmp_runtimes:
+				if lib.startswith(name+'.'):
+					runtime = name
+	context.Result(runtime)
+	return runtime
 
 def find(env, required=True, version='1.0'):
-	"""version: minimal required OpenMP version"""
+	"""
+	version: minimal required OpenMP version
+	Adds the OpenMP flags to CFLAGS, CXXFLAGS and LINKFLAGS and returns a
+	dictionary with the OpenMP version supported by all languages and the
+	runtime library (e.g. libgomp, 'unknown' if not detected) or False.
+	"""
 
-	# Work on a copy of env
-	env = env.Clone()
+	if version not in __openmp_version2date:
+		utils.checks.error('Unknown OpenMP version %s' % (version,))
+		env.Exit(1)
 
 	conf = env.Configure()
-	conf.AddTests({'CheckOmpVersion': __CheckOmpVersion})
+	utils.checks.addDefaultTests(conf)
+	conf.AddTests({'CheckOpenMP': __CheckOpenMP,
+		'CheckOmpRuntime': __CheckOmpRuntime})
 
-	env.Append(CFLAGS=['-fopenmp'])
-	if not conf.CheckOmpVersion(version):
+	cResult = conf.CheckOpenMP('C')
+	results = [cResult]
+	cxxResult = None
+	if env.get('CXX') and env.WhereIs(env.subst('$CXX').split()[0]):
+		cxxResult = conf.CheckOpenMP('C++')
+		results.append(cxxResult)
+
+	date = min(r[1] if r else 0 for r in results)
+	if date < __openmp_version2date[version]:
 		if required:
 			utils.checks.error('OpenMP version %s not supported' % (version,))
 			env.Exit(1)
@@ -87,6 +187,22 @@ def find(env, required=True, version='1.0'):
 			conf.Finish()
 			return False
 
-	conf.Finish()
-	return True
+	with utils.transaction.begin(env) as transaction:
+		env.AppendUnique(CFLAGS=[cResult[0]])
+		if cxxResult:
+			env.AppendUnique(CXXFLAGS=[cxxResult[0]])
+		env.AppendUnique(LINKFLAGS=[(cxxResult or cResult)[0]])
+
+		runtime = conf.CheckOmpRuntime()
+		if not runtime:
+			if required:
+				utils.checks.error('Could not link OpenMP program')
+				env.Exit(1)
+			else:
+				conf.Finish()
+				return False
 
+		transaction.commit()
+
+	conf.Finish()
+	return {'version': _version(date), 'runtime': runtime}
@@ -35,63 +35,119 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import re
 
 import utils.checks
+import utils.prefixindex
+import utils.transaction
 
-def tryLibPath(env, libPath, mpiWrapper, setRpath):
-	envTmp = env.Clone()
-
-	conf = envTmp.Configure()
-	utils.checks.addDefaultTests(conf)
-
-	envTmp.AppendUnique(LIBPATH=libPath)
-
-	# Add path for parasolid library
-	psLibPath = [p for p in map(lambda p: os.path.join(p, 'psKrnl'), libPath) if os.path.exists(p)]
-	envTmp.AppendUnique(LIBPATH=psLibPath)
-	if setRpath:
-		envTmp.AppendUnique(RPATH=psLibPath)
-
-	# TODO check all headers
-	# TODO not all libraries may be available/required
-	libs = [
-		('SimAdvMeshing', 'SimAdvMeshing.h'),
-		('SimMeshing', 'MeshSim.h'),
-		('SimField', 'SimField.h'),
-		('SimExport', 'SimExport.h'),
-		('SimDiscrete', 'SimDiscrete.h'),
-		('SimMeshTools', 'SimMeshTools.h'),
-		(['SimParasolid260', 'SimParasolid270', 'SimParasolid280', 'SimParasolid300', 'SimParasolid310'], None),
-		('SimPartitionedMesh-mpi', 'SimPartitionedMesh.h'),
-		('SimPartitionWrapper-'+mpiWrapper, None),
-		('SimModel', 'SimModel.h'),
-		('pskernel', None)
-	]
-
-	try:
-		for l in libs:
-			if l[1]:
-				if not conf.CheckLibWithHeader(l[0], l[1], 'c++'):
-					return False
-			else:
-				if not conf.CheckLib(l[0]):
-					return False
-	finally:
-		conf.Finish()
-
-	env.Replace(**envTmp.Dictionary())
-	return True
+# Platform directories (e.g. x64_rhel7_gcc48, x64_rhel8_gcc83)
+_platformPattern = re.compile(r'^x64_rhel(\d+)_gcc(\d+)$')
+_parasolidPattern = re.compile(r'^libSimParasolid(\d+)\.(so|a)$')
+
+# TODO check all headers
+# TODO not all libraries may be available/required
+_libs = [
+	('SimAdvMeshing', 'SimAdvMeshing.h'),
+	('SimMeshing', 'MeshSim.h'),
+	('SimField', 'SimField.h'),
+	('SimExport', 'SimExport.h'),
+	('SimDiscrete', 'SimDiscrete.h'),
+	('SimMeshTools', 'SimMeshTools.h'),
+	(None, None), # Parasolid
+	('SimPartitionedMesh-mpi', 'SimPartitionedMesh.h'),
+	(None, None), # Partition wrapper
+	('SimModel', 'SimModel.h'),
+	('pskernel', None)
+]
+
+def _libNames(files):
+	"""Names of all libraries in a list of files"""
+	names = set()
+	for f in files:
+		if f.startswith('lib'):
+			for suffix in ['.so', '.a']:
+				if f.endswith(suffix):
+					names.add(f[3:-len(suffix)])
+	return names
+
+def _platforms(env):
+	"""Returns all platform directories in LIBPATH/PREFIX_LIBPATH (newest first)"""
+	platforms = set()
+	for p in utils.prefixindex.libPathes(env):
+		entry = utils.prefixindex.listing(env, p)
+		if entry:
+			platforms.update(d for d in entry[1] if _platformPattern.match(d))
+	return sorted(platforms, reverse=True,
+		key=lambda d: tuple(int(v) for v in _platformPattern.match(d).groups()))
+
+def _scanLibPath(env, libPath, mpiWrapper):
+	"""
+	Returns the list of (library, header) tuples if all libraries exist in
+	libPath (or the psKrnl subdirectories), otherwise the missing library
+	"""
+	files = set()
+	for p in libPath:
+		entry = utils.prefixindex.listing(env, p)
+		files.update(entry[0])
+		if 'psKrnl' in entry[1]:
+			files.update(utils.prefixindex.listing(env, os.path.join(p, 'psKrnl'))[0])
+
+	parasolid = [m for m in map(_parasolidPattern.match, files) if m]
+	if not parasolid:
+		return 'SimParasolid'
+	parasolid = 'SimParasolid' + max(parasolid, key=lambda m: int(m.group(1))).group(1)
+
+	libs = list(_libs)
+	libs[6] = (parasolid, None)
+	libs[8] = ('SimPartitionWrapper-'+mpiWrapper, None)
+
+	names = _libNames(files)
+	for l in libs:
+		if l[0] not in names:
+			return l[0]
+	return libs
+
+def tryLibPath(env, libPath, libs, setRpath):
+	with utils.transaction.begin(env) as transaction:
+		conf = env.Configure()
+		utils.checks.addDefaultTests(conf)
+
+		env.AppendUnique(LIBPATH=libPath)
+
+		# Add path for parasolid library
+		psLibPath = [p for p in map(lambda p: os.path.join(p, 'psKrnl'), libPath) if os.path.exists(p)]
+		env.AppendUnique(LIBPATH=psLibPath)
+		if setRpath:
+			env.AppendUnique(RPATH=psLibPath)
+
+		try:
+			if conf.CheckLibsWithHeaders(libs, 'c++'):
+				return False
+		finally:
+			conf.Finish()
+
+		transaction.commit()
+		return True
 
 
 def find(env, required=True, mpiLib='mpich2', modifyRpath=True):
-	for lib in ['x64_rhel7_gcc48', 'x64_rhel6_gcc44', 'x64_rhel5_gcc41']:
-		libPath = [p for p in map(lambda p: os.path.join(p, lib), env['LIBPATH']) if os.path.exists(p)]
-		if not libPath:
-			# This library directory does not exist -> try next
+	"""
+	The platform directories (x64_rhel*_gcc*) in LIBPATH (or PREFIX_LIBPATH) and the Parasolid
+	version are detected from the file names. Only directories containing
+	all libraries are tested.
+	"""
+	for lib in _platforms(env):
+		libPath = [p for p in map(lambda p: os.path.join(p, lib), utils.prefixindex.libPathes(env))
+			if utils.prefixindex.exists(env, p, directory=True)]
+
+		libs = _scanLibPath(env, libPath, mpiLib)
+		if not isinstance(libs, list):
+			utils.checks.display('skipping simmodeler libraries in %s (%s not found)' % (lib, libs))
 			continue
 
 		utils.checks.display('checking for simmodeler libraries in %s ...' % lib)
-		if tryLibPath(env, libPath, mpiLib, modifyRpath):
+		if tryLibPath(env, libPath, libs, modifyRpath):
 			return True
 
 	# Not found
@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Compares utils.gitrepo with git describe on generated repositories.
+# Run with python -m pytest tests (skipped if git is not installed).
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import utils.gitrepo
+
+def _hasGit():
+	try:
+		subprocess.check_output(['git', '--version'])
+		return True
+	except (OSError, subprocess.CalledProcessError):
+		return False
+
+@unittest.skipUnless(_hasGit(), 'git is not installed')
+class DescribeTest(unittest.TestCase):
+
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.time = 1500000000
+		self.git('init', '-q', '-b', 'master')
+
+	def tearDown(self):
+		shutil.rmtree(self.path)
+
+	def git(self, *args):
+		env = dict(os.environ,
+			GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+			GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com',
+			GIT_AUTHOR_DATE='%d +0000' % self.time, GIT_COMMITTER_DATE='%d +0000' % self.time)
+		return subprocess.check_output(['git', '-c', 'commit.gpgsign=false', '-c', 'tag.gpgsign=false']
+			+ list(args), cwd=self.path, env=env, universal_newlines=True).strip()
+
+	def commit(self, name):
+		self.time += 60
+		with open(os.path.join(self.path, 'file'), 'w') as f:
+			f.write(name + '\n')
+		self.git('add', 'file')
+		self.git('commit', '-q', '-m', name)
+
+	def tag(self, name):
+		self.git('tag', '-a', '-m', name, name)
+
+	def merge(self, branch):
+		self.time += 60
+		self.git('merge', '-q', '--no-ff', '-s', 'ours', '-m', 'merge '+branch, branch)
+
+	def assertDescribe(self):
+		expected = self.git('describe', '--always')
+		self.assertEqual(utils.gitrepo.Repository(self.path).describe(), expected)
+
+	def testLinear(self):
+		self.commit('c0')
+		self.assertDescribe()
+		for i in range(1, 10):
+			self.commit('c%d' % i)
+			if i % 3 == 0:
+				self.tag('v%d' % i)
+			self.assertDescribe()
+
+	def testMerge(self):
+		for i in range(1, 30):
+			self.commit('c%d' % i)
+			if i % 7 == 0:
+				self.tag('v%d' % i)
+			if i == 10:
+				self.git('checkout', '-q', '-b', 'side')
+				self.commit('s1')
+				self.commit('s2')
+				self.tag('vside')
+				self.git('checkout', '-q', 'master')
+		self.merge('side')
+		self.assertDescribe()
+		for i in range(30, 36):
+			self.commit('c%d' % i)
+			self.assertDescribe()
+
+	def testPacked(self):
+		for i in range(1, 20):
+			self.commit('c%d' % i)
+			if i % 5 == 0:
+				self.tag('v%d' % i)
+			if i == 8:
+				self.git('checkout', '-q', '-b', 'side')
+				self.commit('s1')
+				self.tag('vside')
+				self.git('checkout', '-q', 'master')
+			if i == 15:
+				self.merge('side')
+		self.git('gc', '-q')
+		self.assertDescribe()
+
+	def randomHistory(self, seed):
+		"""Creates branches, merges, tags and commits with clock skew"""
+		rnd = random.Random(seed)
+		self.commit('root')
+		branches = ['master']
+		current = 'master'
+		n = 0
+		for step in range(40):
+			r = rnd.random()
+			if r < 0.1 and len(branches) < 4:
+				current = 'b%d' % step
+				self.git('checkout', '-q', '-b', current)
+				branches.append(current)
+			elif r < 0.2:
+				current = rnd.choice(branches)
+				self.git('checkout', '-q', current)
+			elif r < 0.3 and len(branches) > 1:
+				self.merge(rnd.choice([b for b in branches if b != current]))
+			else:
+				n += 1
+				if rnd.random() < 0.2:
+					self.time -= rnd.randint(0, 200)
+				self.commit('c%d' % n)
+				if rnd.random() < 0.15:
+					self.tag('t%d' % n)
+		return branches
+
+	def testRandom(self):
+		# Seeds 6, 24 and 27 require the depth computation after the last
+		# remaining path is reached
+		for seed in [6, 24, 27, 42]:
+			self.tearDown()
+			self.setUp()
+			for branch in self.randomHistory(seed):
+				self.git('checkout', '-q', branch)
+				self.assertDescribe()
+
+if __name__ == '__main__':
+	unittest.main()
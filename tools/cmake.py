@@ -8,19 +8,157 @@
 #    CMakeBuildDir -- SCons Dir pointing to the working directory used during build.
 #    CMakeCmd -- The 'cmake' executable to run.
 #                Default: cmake
-#    MakeCmd -- The 'make' executable to run.
-#               Default: make
+#    MakeCmd -- The build tool to run (instead of cmake --build).
+#               Default: none
+#    CMakeGenerator -- The CMake generator.
+#                      Default: Ninja if ninja is available and MakeCmd is not set,
+#                               CMake's default otherwise
+#                      (see benchmarks/cmake_noop.py for a comparison)
 #    CMakeOpts -- Options to pass on the CMake command line.
 #                 Default: none
 #    cc        -- C compiler
 #    cxx       -- C++ compiler
+#    CMakeOutputPrefix -- Prefix for each line of output, True to use the name
+#                         of the project.
+#                         Default: True if running in parallel
+#    CMakeArtifactCache -- Directory of the artifact cache (see below).
+#                          Default: $SCONS_CMAKE_CACHE or none (disabled)
+#
+# Incremental builds:
+#    All files of the project and the CMake options are sources of the
+#    targets. cmake is only executed if the options or the CMakeLists.txt/*.cmake
+#    files changed or no CMakeCache.txt exists. Targets are precious, make
+#    decides what to rebuild.
+#
+# Parallel builds:
+#    All commands spawned by environments that load this tool and all make
+#    processes share a GNU make jobserver with num_jobs slots. Thus, the
+#    total number of processes stays at num_jobs, independent of the number
+#    of CMake builders running in parallel. Commands of other environments
+#    do not take a slot (load the tool in these environments as well).
+#    Ninja and non-GNU make do not support the jobserver, they get all slots
+#    that are free when the build starts.
+#
+# Environment:
+#    cmake and the build tool run with env['ENV'] like all other commands.
+#
+# Artifact cache:
+#    Targets are stored in the artifact cache after a successful build. The
+#    key contains the content signatures of all project files (computed by
+#    SCons, use Decider('MD5-timestamp') to avoid reading unchanged files),
+#    CMakeOpts (including the build type), cmake and the compiler. On a hit,
+#    the targets are copied from the cache without running cmake or make. The
+#    cache can be shared by concurrent builds: entries are never modified,
+#    they are written to a temporary directory and renamed. No file locks are
+#    required (works on NFS and Lustre).
+#
+# Usage requirements:
+#    env.UseCMakeTargets(targets, CMakeProject=..., CMakeBuildDir=...) adds the
+#    include directories, definitions and libraries of CMake targets to env.
+#    Libraries are read from the CMake File API, cmake is executed immediately
+#    if the project is not configured yet. Static libraries have no link
+#    information, their external dependencies are only added if a shared
+#    library is requested. The File API does not distinguish between private
+#    and interface flags. Therefore, the tool injects a script
+#    (CMAKE_PROJECT_INCLUDE) that writes the interface include directories
+#    and definitions of all targets (requires CMake >= 3.19).
 
+import hashlib
+import json
 import os
+import re
+import select
+import shutil
 import sys
 import subprocess
+import threading
 
+import SCons.Errors
+import SCons.Node.FS
+import SCons.Util
 from SCons.Script import *
 
+class JobServer(object):
+  """A GNU make jobserver (pipe with one token per free job slot)"""
+
+  def __init__(self, jobs):
+    self.read, self.write = os.pipe()
+    for fd in (self.read, self.write):
+      if hasattr(os, 'set_inheritable'):
+        os.set_inheritable(fd, True)
+    os.write(self.write, b'+' * jobs)
+
+  def acquire(self):
+    os.read(self.read, 1)
+
+  def release(self, count = 1):
+    os.write(self.write, b'+' * count)
+
+  def reserve(self, maximum):
+    """Acquire up to maximum slots without blocking, returns the number of slots"""
+    count = 0
+    while count < maximum and select.select([self.read], [], [], 0)[0]:
+      os.read(self.read, 1)
+      count += 1
+    return count
+
+  def makeflags(self, version):
+    """MAKEFLAGS for GNU make processes using this jobserver"""
+    # --jobserver-fds was renamed in GNU make 4.2
+    option = 'auth' if version >= (4, 2) else 'fds'
+    return ' -j --jobserver-{}={},{}'.format(option, self.read, self.write)
+
+_jobServer = None
+_jobServerLock = threading.Lock()
+
+def jobServer():
+  """Returns the jobserver or None if jobs are not shared"""
+  global _jobServer
+  with _jobServerLock:
+    if _jobServer is None and os.name == 'posix' and GetOption('num_jobs') > 1:
+      _jobServer = JobServer(GetOption('num_jobs'))
+  return _jobServer
+
+def jobServerSpawn(spawn):
+  """Wraps SPAWN to acquire a job slot for each command"""
+
+  def wrapper(sh, escape, cmd, args, env):
+    server = jobServer()
+    if server is None:
+      return spawn(sh, escape, cmd, args, env)
+
+    server.acquire()
+    try:
+      return spawn(sh, escape, cmd, args, env)
+    finally:
+      server.release()
+
+  wrapper.jobServerSpawn = True
+  return wrapper
+
+_makeVersions = dict()
+_makeVersionsLock = threading.Lock()
+
+def makeVersion(makeCmd, environ):
+  """Returns the version of GNU make as tuple or None for other build tools"""
+  with _makeVersionsLock:
+    if makeCmd not in _makeVersions:
+      version = None
+      try:
+        output = subprocess.check_output([makeCmd, '--version'], env = environ,
+          stderr = subprocess.STDOUT, universal_newlines = True)
+        m = re.search(r'GNU Make (\d+)\.(\d+)', output)
+        if m:
+          version = (int(m.group(1)), int(m.group(2)))
+      except (OSError, subprocess.CalledProcessError):
+        pass
+      _makeVersions[makeCmd] = version
+    return _makeVersions[makeCmd]
+
+def processEnv(env):
+  """The environment for cmake and the build tool"""
+  return dict((k, str(v)) for k, v in env['ENV'].items())
+
 def parameters(target, source, env):
   """Assemble CMake parameters."""
 
@@ -48,27 +186,488 @@ def parameters(target, source, env):
   else:
     cMakeBuildDir = os.path.split(str(target[0]))[0]
 
-  if not os.path.exists(cMakeBuildDir):
-    os.makedirs(cMakeBuildDir)
-
-  makeCmd = 'make'
+  makeCmd = None
   if 'MakeCmd' in env.Dictionary().keys():
     makeCmd = env.subst(env['MakeCmd'])
 
   return (cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, makeCmd)
 
+def generator(env):
+  """Returns the CMake generator or None for CMake's default"""
+  if 'CMakeGenerator' in env.Dictionary().keys():
+    return env.subst(env['CMakeGenerator']) or None
+  # MakeCmd has to run in the build tree of CMake's default generator
+  if env.get('MakeCmd'):
+    return None
+  # cmake and the build tool run with env['ENV']
+  if env.WhereIs('ninja'):
+    return 'Ninja'
+  return None
+
+def cmakeCommand(cMakeProject, cMakeCmd, cMakeOpts, gen):
+  cmd = [ cMakeCmd ]
+  if gen:
+    cmd.extend(['-G', gen])
+  if cMakeOpts:
+    cmd.extend(cMakeOpts)
+  cmd.append(cMakeProject)
+  return cmd
+
+def cachedVariable(cMakeBuildDir, name):
+  """Returns a variable from CMakeCache.txt of an existing build directory"""
+  try:
+    with open(os.path.join(cMakeBuildDir, 'CMakeCache.txt')) as f:
+      for line in f:
+        if line.startswith(name + ':'):
+          return line.split('=', 1)[1].strip()
+  except IOError:
+    pass
+  return None
+
+def cachedGenerator(cMakeBuildDir):
+  """Returns the generator used in an existing build directory"""
+  return cachedVariable(cMakeBuildDir, 'CMAKE_GENERATOR')
+
+def buildCommand(cMakeCmd, makeCmd, gen, jobs):
+  """The command to run the build tool with jobs parallel jobs (None to use the jobserver)"""
+  if makeCmd:
+    cmd = [ makeCmd ]
+  else:
+    cmd = [ cMakeCmd, '--build', '.' ]
+  if jobs:
+    if not makeCmd:
+      cmd.append('--')
+    cmd.extend(['-j', str(jobs)])
+  return cmd
+
+def configuration(cMakeProject, cMakeCmd, cMakeOpts, gen, environ):
+  """Everything that requires to rerun cmake if it changes"""
+  return cmakeCommand(cMakeProject, cMakeCmd, cMakeOpts, gen) + [
+    environ.get('CC', ''), environ.get('CXX', '')]
+
+_projectFiles = dict()
+
+def projectFiles(cMakeProject, cMakeBuildDir):
+  """All files of the project (the project is only searched once)"""
+  if (cMakeProject, cMakeBuildDir) not in _projectFiles:
+    files = []
+    for root, dirs, fileNames in os.walk(cMakeProject):
+      # Skip hidden and build directories
+      dirs[:] = sorted(d for d in dirs if not d.startswith('.')
+        and not os.path.exists(os.path.join(root, d, 'CMakeCache.txt'))
+        and os.path.join(root, d) != cMakeBuildDir)
+      files.extend(os.path.join(root, f) for f in sorted(fileNames)
+        if os.path.isfile(os.path.join(root, f)))
+    _projectFiles[(cMakeProject, cMakeBuildDir)] = files
+  return _projectFiles[(cMakeProject, cMakeBuildDir)]
+
+def cmakeFiles(cMakeProject, cMakeBuildDir):
+  """All CMake files of the project"""
+  return [f for f in projectFiles(cMakeProject, cMakeBuildDir)
+    if os.path.basename(f) == 'CMakeLists.txt' or f.endswith('.cmake')]
+
+def configurationStamp(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, environ):
+  files = [(f, os.path.getmtime(f)) for f in cmakeFiles(cMakeProject, cMakeBuildDir)]
+  return json.dumps({'configuration': configuration(cMakeProject, cMakeCmd, cMakeOpts, gen, environ),
+    'files': files}, sort_keys=True)
+
+def readConfigurationStamp(cMakeBuildDir):
+  """Returns the stamp of the last successful cmake run or None"""
+  stampFile = os.path.join(cMakeBuildDir, '.scons_cmake_configuration')
+  if not os.path.exists(os.path.join(cMakeBuildDir, 'CMakeCache.txt')) or not os.path.exists(stampFile):
+    return None
+  with open(stampFile) as f:
+    return f.read()
+
+def writeConfigurationStamp(cMakeBuildDir, stamp):
+  with open(os.path.join(cMakeBuildDir, '.scons_cmake_configuration'), 'w') as f:
+    f.write(stamp)
+
+# Writes the (transitive) INTERFACE_INCLUDE_DIRECTORIES and
+# INTERFACE_COMPILE_DEFINITIONS of all targets at the end of the configuration
+_usageScript = """
+if(CMAKE_VERSION VERSION_LESS 3.19)
+  return()
+endif()
+get_property(_scons_usage GLOBAL PROPERTY SCONS_USAGE)
+if(_scons_usage)
+  return()
+endif()
+set_property(GLOBAL PROPERTY SCONS_USAGE TRUE)
+
+function(_scons_usage_targets dir result)
+  get_property(targets DIRECTORY "${dir}" PROPERTY BUILDSYSTEM_TARGETS)
+  get_property(subdirs DIRECTORY "${dir}" PROPERTY SUBDIRECTORIES)
+  foreach(subdir IN LISTS subdirs)
+    _scons_usage_targets("${subdir}" subTargets)
+    list(APPEND targets ${subTargets})
+  endforeach()
+  set(${result} ${targets} PARENT_SCOPE)
+endfunction()
+
+function(_scons_usage)
+  _scons_usage_targets("${CMAKE_SOURCE_DIR}" targets)
+  foreach(target IN LISTS targets)
+    get_target_property(type ${target} TYPE)
+    if(NOT type STREQUAL "UTILITY")
+      file(GENERATE OUTPUT "${CMAKE_BINARY_DIR}/.scons_cmake_usage/${target}.txt"
+        CONTENT "$<TARGET_PROPERTY:${target},INTERFACE_INCLUDE_DIRECTORIES>\\n$<TARGET_PROPERTY:${target},INTERFACE_COMPILE_DEFINITIONS>\\n"
+        TARGET ${target})
+    endif()
+  endforeach()
+endfunction()
+
+cmake_language(DEFER DIRECTORY "${CMAKE_SOURCE_DIR}" CALL _scons_usage)
+"""
+
+def usageScript(cMakeBuildDir):
+  return os.path.join(cMakeBuildDir, '.scons_cmake_usage.cmake')
+
+def writeUsageScript(cMakeBuildDir):
+  with open(usageScript(cMakeBuildDir), 'w') as f:
+    f.write(_usageScript)
+
+def interfaceUsage(cMakeBuildDir, target):
+  """Returns the interface include directories and definitions of a target or None"""
+  try:
+    with open(os.path.join(cMakeBuildDir, '.scons_cmake_usage', target + '.txt')) as f:
+      lines = f.read().split('\n')
+  except IOError:
+    return None
+  return [[v for v in line.split(';') if v] for line in lines[:2]]
+
+def queryFile(cMakeBuildDir):
+  return os.path.join(cMakeBuildDir, '.cmake', 'api', 'v1', 'query', 'client-scons', 'query.json')
+
+def writeQuery(cMakeBuildDir):
+  """Request the codemodel and the cache from the CMake File API"""
+  if not os.path.exists(os.path.dirname(queryFile(cMakeBuildDir))):
+    os.makedirs(os.path.dirname(queryFile(cMakeBuildDir)))
+  with open(queryFile(cMakeBuildDir), 'w') as f:
+    json.dump({'requests': [{'kind': 'codemodel', 'version': 2},
+      {'kind': 'cache', 'version': 2}]}, f)
+
+def replies(cMakeBuildDir):
+  """Returns the File API replies (kind -> file name) or None"""
+  replyDir = os.path.join(cMakeBuildDir, '.cmake', 'api', 'v1', 'reply')
+  try:
+    indices = sorted(f for f in os.listdir(replyDir) if f.startswith('index-'))
+  except OSError:
+    return None
+  if not indices:
+    return None
+  with open(os.path.join(replyDir, indices[-1])) as f:
+    index = json.load(f)
+  query = index['reply'].get('client-scons', {}).get('query.json', {})
+  result = dict()
+  for response in query.get('responses', []):
+    if 'jsonFile' in response:
+      result[response['kind']] = os.path.join(replyDir, response['jsonFile'])
+  if 'codemodel' not in result:
+    return None
+  return result
+
+def needsConfigure(cMakeBuildDir, stamp):
+  # Old CMake versions do not answer the query, do not rerun cmake in this case
+  return stamp != readConfigurationStamp(cMakeBuildDir) or not os.path.exists(queryFile(cMakeBuildDir))
+
+def configure(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, stamp, prefix, environ):
+  """Run cmake, returns the exit code"""
+  if not os.path.exists(cMakeBuildDir):
+    os.makedirs(cMakeBuildDir)
+
+  oldGen = cachedGenerator(cMakeBuildDir)
+  if oldGen and gen and oldGen != gen:
+    # CMake cannot switch the generator of an existing build directory
+    os.remove(os.path.join(cMakeBuildDir, 'CMakeCache.txt'))
+    shutil.rmtree(os.path.join(cMakeBuildDir, 'CMakeFiles'), True)
+
+  writeQuery(cMakeBuildDir)
+  writeUsageScript(cMakeBuildDir)
+  # CMAKE_PROJECT_INCLUDE in cMakeOpts overrides the script
+  ret = runSubprocess(cmakeCommand(cMakeProject, cMakeCmd,
+    ['-DCMAKE_PROJECT_INCLUDE=' + usageScript(cMakeBuildDir)] + cMakeOpts, gen),
+    cMakeBuildDir, prefix, environ)
+  if not ret:
+    writeConfigurationStamp(cMakeBuildDir, stamp)
+  return ret
+
+def cacheVariables(cMakeBuildDir):
+  """Returns the CMake cache as dictionary (from the File API)"""
+  reply = replies(cMakeBuildDir)
+  if not reply or 'cache' not in reply:
+    return dict()
+  with open(reply['cache']) as f:
+    return dict((e['name'], e['value']) for e in json.load(f)['entries'])
+
+def usage(cMakeBuildDir, targets):
+  """
+  Returns the include directories, definitions and libraries of the targets
+  (as keyword arguments for env.Append) or None if the File API reply is
+  not available.
+  """
+  reply = replies(cMakeBuildDir)
+  if not reply:
+    return None
+
+  replyDir = os.path.dirname(reply['codemodel'])
+  with open(reply['codemodel']) as f:
+    codemodel = json.load(f)
+  buildDir = codemodel['paths']['build']
+
+  # Single-configuration generators have exactly one configuration
+  byId = dict()
+  byName = dict()
+  for t in codemodel['configurations'][0]['targets']:
+    with open(os.path.join(replyDir, t['jsonFile'])) as f:
+      byId[t['id']] = byName[t['name']] = json.load(f)
+
+  result = {'CPPPATH': [], 'CPPDEFINES': [], 'LIBPATH': [], 'LIBS': [],
+    'LINKFLAGS': [], 'RPATH': []}
+  def add(key, value):
+    if value not in result[key]:
+      result[key].append(value)
+
+  def addTarget(target, visited):
+    if target['id'] in visited:
+      return
+    visited.add(target['id'])
+
+    if target['type'] in ['STATIC_LIBRARY', 'SHARED_LIBRARY']:
+      for artifact in target.get('artifacts', []):
+        path = os.path.join(buildDir, artifact['path'])
+        add('LIBS', path)
+        if target['type'] == 'SHARED_LIBRARY':
+          add('RPATH', os.path.dirname(path))
+
+    for dependency in target.get('dependencies', []):
+      addTarget(byId[dependency['id']], visited)
+
+    for fragment in target.get('link', {}).get('commandFragments', []):
+      value = fragment['fragment'].strip()
+      if not value:
+        continue
+      if fragment['role'] == 'libraries':
+        if value.startswith('-l'):
+          add('LIBS', value[2:])
+        elif os.path.isabs(value):
+          add('LIBS', value)
+        # Relative paths are targets of the project (added as dependencies)
+      elif fragment['role'] == 'libraryPath' and value.startswith('-L'):
+        add('LIBPATH', value[2:])
+      elif fragment['role'] == 'flags':
+        add('LINKFLAGS', value)
+
+  if not SCons.Util.is_List(targets):
+    targets = [targets]
+  visited = set()
+  for name in targets:
+    if name not in byName:
+      raise SCons.Errors.UserError('Unknown CMake target {} in {} (available targets: {})'.format(
+        name, cMakeBuildDir, ', '.join(sorted(byName))))
+
+    # The interface requirements of the dependencies are already included
+    interface = interfaceUsage(cMakeBuildDir, name)
+    if interface is None:
+      raise SCons.Errors.UserError('Interface usage requirements of CMake target {} not found'
+        ' (requires CMake >= 3.19 and no CMAKE_PROJECT_INCLUDE in CMakeOpts)'.format(name))
+    for include in interface[0]:
+      add('CPPPATH', include)
+    for define in interface[1]:
+      add('CPPDEFINES', define)
+
+    addTarget(byName[name], visited)
+
+  return result
+
+def useTargets(env, targets, **kw):
+  """
+  Adds the usage requirements of the CMake targets to env without running
+  any configure tests. Returns False if the CMake File API is not available.
+  """
+  cenv = env.Override(kw)
+  if 'CMakeBuildDir' not in cenv.Dictionary().keys():
+    print('UseCMakeTargets requires CMakeBuildDir variable')
+    Exit(1)
+  (cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, makeCmd) = parameters(None, [], cenv)
+
+  if not GetOption('help') and not GetOption('clean'):
+    gen = generator(cenv)
+    environ = processEnv(cenv)
+    stamp = configurationStamp(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, environ)
+    if needsConfigure(cMakeBuildDir, stamp):
+      if configure(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, stamp,
+          outputPrefix(cenv, cMakeProject), environ):
+        print('Could not configure {}'.format(cMakeProject))
+        Exit(1)
+
+  flags = usage(cMakeBuildDir, targets)
+  if flags is None:
+    return False
+
+  libs = flags.pop('LIBS')
+  env.AppendUnique(**flags)
+  env.AppendUnique(delete_existing=1,
+    LIBS=[env.File(l) if os.path.isabs(l) else l for l in libs])
+  return True
+
+def emitter(target, source, env):
+  """Add the CMake files and options as sources"""
+
+  (cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, makeCmd) = parameters(target, source, env)
+
+  source = source + [env.File(f) for f in projectFiles(cMakeProject, cMakeBuildDir)]
+  source.append(env.Value(' '.join(configuration(cMakeProject, cMakeCmd, cMakeOpts, generator(env),
+    processEnv(env)))))
+
+  # Do not remove targets before the build, make updates them if required
+  env.Precious(target)
+
+  return (target, source)
+
 def message(target, source, env):
   """Return a pretty make message"""
 
   (cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, makeCmd) = parameters(target, source, env)
 
-  return 'cd {} && {} {} {} && {} -j {}'.format(cMakeBuildDir, cMakeCmd, ' '.join(cMakeOpts) if cMakeOpts != None else '', cMakeProject, makeCmd, GetOption('num_jobs'))
+  gen = generator(env)
+  if jobServer():
+    jobs = None
+  else:
+    jobs = GetOption('num_jobs')
+  build = ' '.join(buildCommand(cMakeCmd, makeCmd, gen, jobs))
+  if jobServer():
+    build += ' (jobserver)'
+  if not needsConfigure(cMakeBuildDir, configurationStamp(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen,
+      processEnv(env))):
+    return 'cd {} && {}'.format(cMakeBuildDir, build)
+  return 'cd {} && {} && {}'.format(cMakeBuildDir, ' '.join(cmakeCommand(cMakeProject, cMakeCmd, cMakeOpts, gen)), build)
+
+_outputLock = threading.Lock()
+
+def outputPrefix(env, cMakeProject):
+  prefix = env.get('CMakeOutputPrefix', GetOption('num_jobs') > 1)
+  if prefix is True:
+    return '[{}] '.format(os.path.basename(cMakeProject))
+  if not prefix:
+    return ''
+  return env.subst(prefix)
+
+def runSubprocess(cmd, cwd, prefix, env = None):
+  """Run a process and forward stdout and stderr line by line, returns the exit code"""
+
+  process = subprocess.Popen( cmd,
+                              cwd = cwd,
+                              env = env,
+                              close_fds = False,
+                              stdout = subprocess.PIPE,
+                              stderr = subprocess.PIPE,
+                              universal_newlines = True,
+                              bufsize = 1 )
+
+  def forward(pipe, stream):
+    for line in iter(pipe.readline, ''):
+      with _outputLock:
+        stream.write(prefix + line)
+        stream.flush()
+    pipe.close()
 
-def printSubprocess(process):
-  output = process.communicate()[0]
-  output = output.decode('ascii') if isinstance(output, bytes) else output
-  sys.stdout.write(output)
-  sys.stdout.flush()
+  # Read both pipes concurrently to avoid dead locks
+  threads = [threading.Thread(target = forward, args = (process.stdout, sys.stdout)),
+    threading.Thread(target = forward, args = (process.stderr, sys.stderr))]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+
+  return process.wait()
+
+def artifactCache(env):
+  """Returns the directory of the artifact cache or None"""
+  cacheDir = env.get('CMakeArtifactCache', os.environ.get('SCONS_CMAKE_CACHE'))
+  if not cacheDir:
+    return None
+  return env.Dir(cacheDir).abspath
+
+def signature(node):
+  """Content signature of a file, reused from the .sconsign if the time stamp did not change"""
+  stored = node.get_stored_info().ninfo
+  if getattr(stored, 'csig', None) and getattr(stored, 'timestamp', None) == node.get_timestamp():
+    return stored.csig
+  return node.get_csig()
+
+def sourceHash(cMakeProject, source):
+  """Hash of the content signatures of all project files"""
+  h = hashlib.sha1()
+  for s in source:
+    if isinstance(s, SCons.Node.FS.File):
+      h.update(os.path.relpath(s.abspath, cMakeProject).encode('utf-8'))
+      h.update(signature(s).encode('ascii'))
+  return h.hexdigest()
+
+def compilerIdentity(cMakeCmd, cMakeOpts, environ):
+  """Path, size and modification time of cmake and the compilers"""
+  programs = [cMakeCmd, environ.get('CC', 'cc'), environ.get('CXX', 'c++')]
+  for opt in cMakeOpts:
+    m = re.match(r'-DCMAKE_(C|CXX|Fortran)_COMPILER(:\w+)?=(.*)', opt)
+    if m:
+      programs.append(m.group(3))
+
+  identity = []
+  for p in programs:
+    path = SCons.Util.WhereIs(p, environ.get('PATH')) or p
+    try:
+      path = os.path.realpath(path)
+      stat = os.stat(path)
+      identity.append([path, stat.st_size, stat.st_mtime])
+    except OSError:
+      identity.append([p])
+  return identity
+
+def artifactKey(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, target, source, environ):
+  buildType = ''
+  for opt in cMakeOpts:
+    m = re.match(r'-DCMAKE_BUILD_TYPE(:\w+)?=(.*)', opt)
+    if m:
+      buildType = m.group(2)
+  key = {'sources': sourceHash(cMakeProject, source),
+    'options': list(cMakeOpts),
+    'compiler': compilerIdentity(cMakeCmd, cMakeOpts, environ),
+    'buildType': buildType,
+    'targets': [os.path.relpath(str(t), cMakeBuildDir) for t in target]}
+  return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+def restoreArtifacts(cacheDir, key, target):
+  """Copy the targets from the cache, returns False if the entry does not exist"""
+  entry = os.path.join(cacheDir, key)
+  if not os.path.exists(entry):
+    return False
+  for i, t in enumerate(target):
+    path = str(t)
+    if os.path.lexists(path):
+      os.remove(path)
+    elif not os.path.exists(os.path.dirname(os.path.abspath(path))):
+      os.makedirs(os.path.dirname(os.path.abspath(path)))
+    # Copy to a temporary file first, the target is never incomplete
+    shutil.copy2(os.path.join(entry, str(i)), path + '.tmp')
+    os.rename(path + '.tmp', path)
+  return True
+
+def storeArtifacts(cacheDir, key, target):
+  """Store the targets in the cache (entries are complete once they exist)"""
+  entry = os.path.join(cacheDir, key)
+  if os.path.exists(entry):
+    return
+  tmp = '{}.tmp{}'.format(entry, os.getpid())
+  shutil.rmtree(tmp, True)
+  os.makedirs(tmp)
+  for i, t in enumerate(target):
+    shutil.copy2(str(t), os.path.join(tmp, str(i)))
+  try:
+    os.rename(tmp, entry)
+  except OSError:
+    # Stored by another build in the meantime
+    shutil.rmtree(tmp, True)
 
 def builder(target, source, env):
   """Run cmake and make."""
@@ -81,35 +680,61 @@ def builder(target, source, env):
   if not os.path.exists(cMakeProject):
     print('Path %s not found' % cMakeProject)
 
-  # Build up the command and its arguments in a list
-  cmakeAssembled = [ cMakeCmd ]
+  gen = generator(env)
+  prefix = outputPrefix(env, cMakeProject)
+  environ = processEnv(env)
 
-  if cMakeOpts:
-    cmakeAssembled.extend(cMakeOpts)
+  cacheDir = artifactCache(env)
+  if cacheDir:
+    key = artifactKey(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, target, source, environ)
+    if restoreArtifacts(cacheDir, key, target):
+      print('{}restored from artifact cache {}'.format(prefix, key))
+      return 0
 
-  cmakeAssembled.append(cMakeProject)
+  # The builder itself occupies one job slot (make uses this slot for its first job)
+  server = jobServer()
+  if server:
+    server.acquire()
+  reserved = 0
 
-  # cmake
-  cmake = subprocess.Popen( cmakeAssembled,
-                            cwd = cMakeBuildDir,
-                            stdout = subprocess.PIPE,
-                            stderr = subprocess.PIPE,
-                            universal_newlines=True )
-  printSubprocess(cmake)
+  try:
+    # cmake (only if the configuration changed)
+    stamp = configurationStamp(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, environ)
+    if needsConfigure(cMakeBuildDir, stamp):
+      ret = configure(cMakeProject, cMakeCmd, cMakeOpts, cMakeBuildDir, gen, stamp, prefix, environ)
+      if ret:
+        return ret
 
-  makeAssembled = [ makeCmd, '-j', str(GetOption('num_jobs'))]
+    version = None
+    if server:
+      buildTool = makeCmd or cachedVariable(cMakeBuildDir, 'CMAKE_MAKE_PROGRAM')
+      if buildTool:
+        version = makeVersion(buildTool, environ)
 
-  # make
-  make = subprocess.Popen( makeAssembled,
-                           cwd = cMakeBuildDir,
-                           stdout = subprocess.PIPE,
-                           stderr = subprocess.PIPE )
-  printSubprocess(make)
+    if version:
+      # make gets the job slots from the jobserver
+      jobs = None
+      environ['MAKEFLAGS'] = environ.get('MAKEFLAGS', '') + server.makeflags(version)
+    elif server:
+      reserved = server.reserve(GetOption('num_jobs') - 1)
+      jobs = reserved + 1
+    else:
+      jobs = GetOption('num_jobs')
 
-  return make.returncode
+    # make/ninja
+    ret = runSubprocess(buildCommand(cMakeCmd, makeCmd, gen, jobs), cMakeBuildDir, prefix, environ)
+    if not ret and cacheDir:
+      storeArtifacts(cacheDir, key, target)
+    return ret
+  finally:
+    if server:
+      server.release(reserved + 1)
 
 def generate(env, **kwargs):
-  env['BUILDERS']['CMake'] = env.Builder(action = env.Action(builder, message))
+  env['BUILDERS']['CMake'] = env.Builder(action = env.Action(builder, message), emitter = emitter)
+  if not getattr(env['SPAWN'], 'jobServerSpawn', False):
+    env['SPAWN'] = jobServerSpawn(env['SPAWN'])
+  env.AddMethod(useTargets, 'UseCMakeTargets')
 
 def exists(env):
   return True
@@ -34,7 +34,20 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import contextlib
+import threading
+
 import SCons
+import SCons.SConf
+
+import utils.linkorder
+import utils.macros
+import utils.prefixindex
+import utils.profile
+import utils.symbols
+
+# Collectors of the probed files and the output buffer (per thread)
+__local = threading.local()
 
 def _lang2name(lang):
 	"""Unify language name"""
@@ -48,22 +61,66 @@ def _lang2name(lang):
 
 def _libInEnv(libs, env):
 	"""Checks if a libraries is defined in the current environment"""
-	try:
-		for l in libs:
-			if l in env['LIBS']:
-				env.AppendUnique(delete_existing=1, LIBS=[l]) # Ensure that the library is at the end
-				return l
-	except KeyError:
-		pass
+	for l in libs:
+		if utils.linkorder.contains(env, l):
+			utils.linkorder.require(env, l) # Ensure that the library is after the libraries requiring it
+			return l
 
 	return False
 
+def addProbed(kind, files):
+	"""
+	Records headers (kind='headers') or .pc files (kind='pcFiles') used by
+	a check (used to validate cached results)
+	"""
+	for probed in getattr(__local, 'collectors', []):
+		probed[kind].extend(files)
+
+@contextlib.contextmanager
+def collect():
+	"""Collects the files probed in the current thread"""
+	probed = {'headers': [], 'pcFiles': []}
+	if not hasattr(__local, 'collectors'):
+		__local.collectors = []
+	__local.collectors.append(probed)
+	try:
+		yield probed
+	finally:
+		__local.collectors.remove(probed)
+
+@contextlib.contextmanager
+def buffered(output):
+	"""Appends all messages displayed in the current thread to output"""
+	old = getattr(__local, 'output', None)
+	__local.output = output
+	try:
+		yield
+	finally:
+		__local.output = old
+
 def display(msg):
-	SCons.Util.DisplayEngine()('scons: '+msg)
+	output = getattr(__local, 'output', None)
+	if output is not None:
+		output.append('scons: '+msg+'\n')
+	else:
+		SCons.Util.DisplayEngine()('scons: '+msg)
 
 def error(msg):
 	display('error: '+msg)
 
+def fresh(context):
+	"""
+	Marks the result of the current test as not cached. SConf assumes a
+	cached result ("(cached)") if no test program was built.
+	"""
+	context.sconf.cached = 0
+
+def _answer(context, message, result):
+	"""Reports a result found without building a test program"""
+	context.Message(message)
+	fresh(context)
+	context.Result(result)
+
 def CheckProg(context, prog_name):
 	"""
 	This function is from the latest version of SCons to support
@@ -89,6 +146,9 @@ def CheckLib(context, library = None, symbol = "main",
 	compiles without flags.
 	"""
 
+	# Symbols can be looked up without compiling if no header is required
+	lookupSymbol = symbol and symbol != 'main' and not header
+
 	if not header:
 		header = ''
 
@@ -108,6 +168,27 @@ def CheckLib(context, library = None, symbol = "main",
 			context.Result(True)
 			return True
 
+	utils.prefixindex.addLibPathes(context.env, library)
+
+	if lookupSymbol:
+		# Read the symbol tables, link only if the result is ambiguous
+		# (the symbol may also be defined in extra_libs)
+		for l in library:
+			found = utils.symbols.defines(context.env, l, symbol, _lang2name(language)) \
+				if l and not extra_libs else None
+			if found is None:
+				found = not SCons.Conftest.CheckLib(context, [l], symbol, header = header,
+					language = language, extra_libs = extra_libs, autoadd = autoadd)
+				context.did_show_result = 1
+			else:
+				_answer(context, "Checking for %s() in %s library %s... "
+					% (symbol, _lang2name(language), l), found)
+				if found and autoadd:
+					context.AppendLIBS([l] + (extra_libs or []))
+			if found:
+				return True
+		return False
+
 	# ToDo: accept path for the library
 	res = SCons.Conftest.CheckLib(context, library, symbol, header = header,
 		language = language, extra_libs = extra_libs, autoadd = autoadd)
@@ -124,6 +205,8 @@ def CheckLibWithHeader(context, libs, header, language,
 	As in CheckLib, we support library=None, to test if the call compiles
 	without extra link flags.
 	"""
+	addProbed('headers', header if SCons.Util.is_List(header) else [header])
+
 	prog_prefix, dummy = \
 		SCons.SConf.createIncludesFromHeaders(header, 0)
 
@@ -142,16 +225,123 @@ def CheckLibWithHeader(context, libs, header, language,
 		context.Result(True)
 		return True
 
+	# Fail without compiling if the header is missing
+	headers = header if SCons.Util.is_List(header) else [header]
+	utils.prefixindex.addLibPathes(context.env, libs)
+	if utils.prefixindex.checkHeaders(context.env, headers, _lang2name(language)):
+		_answer(context, "Checking for %s library %s... " % (_lang2name(language), libs[0]), False)
+		return False
+
 	res = SCons.Conftest.CheckLib(context, libs, None, prog_prefix,
 		call = call, language = language, extra_libs = extra_libs,
 		autoadd = autoadd)
 	context.did_show_result = 1
 	return not res
 
+def _tryLinkLibs(context, libs, suffix, autoadd = 0):
+	"""Links a program including all headers against all libraries in libs"""
+	text = ''.join(SCons.SConf.createIncludesFromHeaders(l[1], 0)[0] for l in libs if l[1])
+	if 'CONF_PREFIX' in context.env:
+		text = context.env['CONF_PREFIX'] + text
+	text = text + '\nint main(int argc, char** argv) {\n\treturn 0;\n}\n'
+
+	names = [l[0] for l in libs if l[0]]
+	oldLIBS = context.env.get('LIBS', [])
+	if not SCons.Util.is_List(oldLIBS):
+		oldLIBS = [oldLIBS]
+	context.env.Replace(LIBS=[l for l in oldLIBS if l not in names] + names)
+
+	ret = context.TryLink(text, suffix)
+	if not ret or not autoadd:
+		context.env.Replace(LIBS=oldLIBS)
+	return ret
+
+def CheckLibsWithHeaders(context, libs, language, autoadd = 1):
+	"""
+	Checks a list of (library, header) tuples with a single test program.
+	Header or library may be None. Returns None if all libraries are
+	available, otherwise the first missing library. If the combined test
+	fails, the missing library is located by bisecting the list. This
+	assumes that libraries are ordered as in the link line.
+	"""
+	for l in libs:
+		if l[1]:
+			addProbed('headers', l[1] if SCons.Util.is_List(l[1]) else [l[1]])
+
+	lang = _lang2name(language)
+	suffix = '.cpp' if lang == 'C++' else '.c'
+
+	context.Message("Checking for %s libraries %s... "
+		% (lang, ', '.join(str(l[0]) for l in libs if l[0])))
+
+	# Headers that are not in the search path
+	utils.prefixindex.addLibPathes(context.env, [l[0] for l in libs])
+	for l in libs:
+		headers = l[1] if SCons.Util.is_List(l[1]) else [l[1]]
+		if l[1] and utils.prefixindex.checkHeaders(context.env, headers, lang):
+			missing = l[0] or l[1]
+			context.Result('no (%s not found)' % missing)
+			return missing
+
+	if _tryLinkLibs(context, libs, suffix, autoadd):
+		context.Result(True)
+		return None
+
+	# The first prefix that fails contains the missing library
+	lo = 0
+	hi = len(libs)
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		if _tryLinkLibs(context, libs[:mid], suffix):
+			lo = mid
+		else:
+			hi = mid
+
+	missing = libs[hi-1][0] or libs[hi-1][1]
+	context.Result('no (%s not found)' % missing)
+	return missing
+
+def CheckHeader(context, header, include_quotes = '<>', language = None):
+	"""
+	Wrapper for the SCons test that remembers the header.
+	"""
+	headers = header if SCons.Util.is_List(header) else [header]
+	addProbed('headers', headers)
+
+	# Only headers in the search path of the compiler can be checked
+	if include_quotes[0] == '<':
+		missing = utils.prefixindex.checkHeaders(context.env, headers, _lang2name(language))
+		if missing:
+			_answer(context, "Checking for %s header file %s... " % (_lang2name(language), missing), False)
+			return False
+
+	return SCons.SConf.CheckHeader(context, header, include_quotes, language)
+
+def CheckVersion(context, name, header, macros, language = None):
+	"""
+	Reports the version of a library defined by the macros (e.g. major,
+	minor, patch) in header. The header is not compiled but preprocessed
+	together with all other version headers (see utils.macros).
+	Returns the version or None if the header was not found.
+	"""
+	addProbed('headers', [header])
+
+	context.Message("Checking for %s version... " % name)
+	defined = utils.macros.get(context.env, _lang2name(language))
+	version = None
+	if utils.macros.included(defined, header):
+		version = utils.macros.version(defined, macros)
+	fresh(context)
+	context.Result(version or 'unknown')
+	return version
 
 def addDefaultTests(conf):
+	utils.profile.instrument(conf)
 	conf.AddTests({
+		'CheckHeader': CheckHeader,
 		'CheckProg': CheckProg,
 		'CheckLib': CheckLib,
-		'CheckLibWithHeader': CheckLibWithHeader
+		'CheckLibWithHeader': CheckLibWithHeader,
+		'CheckLibsWithHeaders': CheckLibsWithHeaders,
+		'CheckVersion': CheckVersion
 		})
@@ -0,0 +1,102 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import SCons.Util
+
+# Construction variables a finder may modify
+TRACKED = ['CPPPATH', 'LIBPATH', 'LIBS', 'CPPDEFINES', 'RPATH',
+	'CFLAGS', 'CXXFLAGS', 'CCFLAGS', 'LINKFLAGS']
+
+def _toList(value):
+	if value is None:
+		return []
+	if SCons.Util.is_List(value):
+		return list(value)
+	if SCons.Util.is_Dict(value):
+		return [(k, v) if v is not None else k for k, v in sorted(value.items())]
+	if SCons.Util.is_String(value):
+		return value.split()
+	return [value]
+
+def snapshot(env, keys=TRACKED):
+	"""Returns a copy of the tracked construction variables"""
+	return dict((key, _toList(env.get(key))) for key in keys)
+
+def changes(before, after):
+	"""
+	Computes the changes required to get from before to after.
+	For each variable, the result contains the tail of after, starting
+	with the first element that differs. Applying the tail with
+	delete_existing reproduces the order of after (important for LIBS).
+	"""
+	result = dict()
+	for key in after:
+		old = before.get(key, [])
+		new = after[key]
+		i = 0
+		while i < len(old) and i < len(new) and old[i] == new[i]:
+			i += 1
+		if new[i:]:
+			result[key] = new[i:]
+	return result
+
+def apply(env, changes):
+	"""
+	Applies changes computed with changes() to env. Existing elements of the
+	tail are moved to the end, the values are not converted (the result is
+	the same as running the finder).
+	"""
+	for key in sorted(changes.keys()):
+		tail = list(changes[key])
+		env[key] = [v for v in _toList(env.get(key)) if v not in tail] + tail
+
+def _encodeValue(value):
+	if isinstance(value, tuple):
+		return list(value)
+	if isinstance(value, (int, float)) or SCons.Util.is_String(value):
+		return value
+	# Nodes and other objects
+	return str(value)
+
+def encode(changes):
+	"""Converts changes into a JSON compatible format"""
+	return dict((key, [_encodeValue(v) for v in value])
+		for key, value in changes.items())
+
+def decode(changes):
+	"""Inverse of encode()"""
+	return dict((str(key), [tuple(v) if isinstance(v, list) else v for v in value])
+		for key, value in changes.items())
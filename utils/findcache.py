@@ -0,0 +1,182 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import json
+import os
+
+import SCons.Util
+
+import utils.checks
+import utils.envstate
+import utils.options
+
+# Default search pathes of the compiler (not part of CPPPATH/LIBPATH)
+_defaultIncPathes = ['/usr/local/include', '/usr/include']
+_defaultLibPathes = ['/usr/local/lib64', '/usr/local/lib', '/usr/lib64', '/usr/lib',
+	'/usr/lib/x86_64-linux-gnu', '/lib64', '/lib']
+
+_libSuffixes = ['.so', '.a', '.dylib']
+
+# Content of the cache file (loaded on demand)
+__cache = None
+
+def _fileName(env):
+	return env.File(env.get('FIND_CACHE', '#.scons_tools_cache.json')).abspath
+
+def enabled(env):
+	"""Cache is enabled unless FIND_CACHE is set to False"""
+	return bool(env.get('FIND_CACHE', True))
+
+def forced(env):
+	"""Reconfiguration forced with --reconfigure or --config=force"""
+	return utils.options.get('reconfigure') or env.GetOption('config') == 'force'
+
+def fileStat(path):
+	"""Modification time and size of path (None if it does not exist)"""
+	try:
+		s = os.stat(path)
+		return [s.st_mtime, s.st_size]
+	except OSError:
+		return None
+
+def _pathes(env, key):
+	return [os.path.abspath(env.subst(str(p))) for p in utils.envstate.snapshot(env, [key])[key]]
+
+def toolchain(env):
+	"""Path and timestamp of the compilers (changes with every compiler update)"""
+	result = []
+	for cc in ['CC', 'CXX']:
+		if cc not in env:
+			continue
+		prog = env.subst('$'+cc)
+		path = env.WhereIs(prog.split()[0]) if prog else None
+		result.append([prog, path, fileStat(path) if path else None])
+	return result
+
+def fingerprint(env, lib, kw, tracked=utils.envstate.TRACKED):
+	"""Computes the key for a finder call (depends on the tracked variables)"""
+	data = {
+		'lib': lib,
+		'kw': sorted((k, repr(v)) for k, v in kw.items()),
+		'toolchain': toolchain(env),
+		'prefixPath': env.get('prefixPath', []),
+		'path': env['ENV'].get('PATH'),
+		'pkgconfig': env['ENV'].get('PKG_CONFIG_PATH'),
+		'env': utils.envstate.encode(utils.envstate.snapshot(env, tracked))
+	}
+	return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def files(env, headers, libs, pcFiles=[]):
+	"""
+	Returns the time stamps of the headers, the libraries (e.g. the libraries
+	added by a finder) and the .pc files
+	"""
+	result = dict()
+	for f in pcFiles:
+		result[f] = fileStat(f)
+
+	incPathes = _pathes(env, 'CPPPATH') + _defaultIncPathes
+	for header in headers:
+		for p in incPathes:
+			path = os.path.join(p, header)
+			if os.path.exists(path):
+				result[path] = fileStat(path)
+				break
+
+	libPathes = _pathes(env, 'LIBPATH') + _defaultLibPathes
+	for lib in libs:
+		if not SCons.Util.is_String(lib):
+			lib = str(lib)
+		if os.path.isabs(lib):
+			result[lib] = fileStat(lib)
+			continue
+		for p in libPathes:
+			found = [os.path.join(p, 'lib'+lib+s) for s in _libSuffixes \
+				if os.path.exists(os.path.join(p, 'lib'+lib+s))]
+			if found:
+				for f in found:
+					result[f] = fileStat(f)
+				break
+
+	return result
+
+def _load(env):
+	global __cache
+	if __cache is None:
+		try:
+			with open(_fileName(env)) as f:
+				__cache = json.load(f)
+		except (IOError, ValueError):
+			__cache = dict()
+	return __cache
+
+def _save(env):
+	fileName = _fileName(env)
+	try:
+		with open(fileName+'.tmp', 'w') as f:
+			json.dump(__cache, f, indent=1, sort_keys=True)
+		os.rename(fileName+'.tmp', fileName)
+	except (IOError, OSError) as e:
+		utils.checks.display('warning: could not write %s: %s' % (fileName, e))
+
+def lookup(env, key):
+	"""Returns the cached entry for key or None if it does not exist or is outdated"""
+	entry = _load(env).get(key)
+	if not entry:
+		return None
+
+	for path, stat in entry['files'].items():
+		if fileStat(path) != stat:
+			return None
+
+	return entry
+
+def store(env, key, lib, result, changes, files):
+	entry = {'lib': lib,
+		'result': result,
+		'changes': utils.envstate.encode(changes),
+		'files': files}
+	_load(env)[key] = entry
+	_save(env)
+
+def invalidate(env, lib=None):
+	"""Removes all entries for lib (or all entries) from the cache"""
+	cache = _load(env)
+	for key in list(cache.keys()):
+		if lib is None or cache[key]['lib'] == lib:
+			del cache[key]
+	_save(env)
@@ -0,0 +1,589 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Minimal read-only access to git repositories without running git.
+# Supports loose objects, pack files (v2 index) and packed-refs. Everything
+# else (e.g. shallow clones, alternates) raises GitError.
+
+import binascii
+import bisect
+import collections
+import hashlib
+import os
+import re
+import stat
+import struct
+import zlib
+
+class GitError(Exception):
+	pass
+
+_OBJ_COMMIT = 1
+_OBJ_TAG = 4
+_OBJ_OFS_DELTA = 6
+_OBJ_REF_DELTA = 7
+
+_typeNames = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+
+_MODE_GITLINK = 0o160000
+# Extended flags of index entries
+_SKIP_WORKTREE = 0x4000
+_INTENT_TO_ADD = 0x2000
+
+_IndexEntry = collections.namedtuple('_IndexEntry',
+	['path', 'mode', 'mtime', 'mtimeNs', 'size', 'sha', 'stage', 'extended'])
+
+def _hex(binSha):
+	return binascii.hexlify(binSha).decode('ascii')
+
+def _read(fileName):
+	with open(fileName, 'rb') as f:
+		return f.read()
+
+def _readText(fileName):
+	return _read(fileName).decode('utf-8').strip()
+
+def _stat(fileName):
+	try:
+		s = os.stat(fileName)
+		return [s.st_mtime_ns, s.st_size]
+	except OSError:
+		return None
+
+class _DateQueue(object):
+	"""Commits ordered by date (newest first, same dates in insertion order)"""
+
+	def __init__(self):
+		self._items = []
+		self._counter = 0
+
+	def __len__(self):
+		return len(self._items)
+
+	def push(self, sha, time):
+		self._counter += 1
+		bisect.insort(self._items, (-time, self._counter, sha))
+
+	def pop(self):
+		return self._items.pop(0)[2]
+
+	def shas(self):
+		return [item[2] for item in self._items]
+
+class _Pack(object):
+	"""A pack file with version 2 index"""
+
+	def __init__(self, idxName):
+		self.packName = idxName[:-4] + '.pack'
+		idx = _read(idxName)
+		if idx[:8] != b'\377tOc\0\0\0\2':
+			raise GitError('unsupported pack index %s' % idxName)
+		self.count = struct.unpack('>I', idx[8+255*4:8+256*4])[0]
+		self.fanout = struct.unpack('>256I', idx[8:8+256*4])
+		shaStart = 8 + 256*4
+		self.shas = idx[shaStart:shaStart+20*self.count]
+		offStart = shaStart + 24*self.count
+		self.offsets = struct.unpack('>%dI' % self.count, idx[offStart:offStart+4*self.count])
+		self.largeOffsets = idx[offStart+4*self.count:]
+		self.data = None
+
+	def _sha(self, i):
+		return self.shas[20*i:20*i+20]
+
+	def _range(self, first):
+		return (self.fanout[first-1] if first > 0 else 0, self.fanout[first])
+
+	def find(self, sha):
+		"""Returns the position of the binary sha or None"""
+		lo, hi = self._range(sha[0])
+		while lo < hi:
+			mid = (lo + hi) // 2
+			s = self._sha(mid)
+			if s < sha:
+				lo = mid + 1
+			elif s > sha:
+				hi = mid
+			else:
+				return mid
+		return None
+
+	def prefixMatches(self, sha, length):
+		"""Number of objects starting with the first length hex digits of sha"""
+		prefix = _hex(sha)[:length]
+		lo, hi = self._range(sha[0])
+		return sum(1 for i in range(lo, hi) if _hex(self._sha(i)).startswith(prefix))
+
+	def _offset(self, i):
+		off = self.offsets[i]
+		if off & 0x80000000:
+			j = off & 0x7fffffff
+			off = struct.unpack('>Q', self.largeOffsets[8*j:8*j+8])[0]
+		return off
+
+	def read(self, repo, i):
+		if self.data is None:
+			self.data = _read(self.packName)
+		return self._readAt(repo, self._offset(i))
+
+	def _readAt(self, repo, offset):
+		data = self.data
+		start = offset
+		c = data[offset]
+		offset += 1
+		objType = (c >> 4) & 7
+		size = c & 15
+		shift = 4
+		while c & 0x80:
+			c = data[offset]
+			offset += 1
+			size |= (c & 0x7f) << shift
+			shift += 7
+
+		if objType == _OBJ_OFS_DELTA:
+			c = data[offset]
+			offset += 1
+			baseOffset = c & 0x7f
+			while c & 0x80:
+				c = data[offset]
+				offset += 1
+				baseOffset = ((baseOffset + 1) << 7) | (c & 0x7f)
+			baseType, base = self._readAt(repo, start - baseOffset)
+			return (baseType, _applyDelta(base, _inflate(data, offset)))
+		if objType == _OBJ_REF_DELTA:
+			baseType, base = repo.readObject(_hex(data[offset:offset+20]))
+			return (baseType, _applyDelta(base, _inflate(data, offset+20)))
+
+		return (_typeNames[objType], _inflate(data, offset))
+
+def _inflate(data, offset):
+	d = zlib.decompressobj()
+	result = []
+	while not d.eof:
+		chunk = data[offset:offset+65536]
+		if not chunk:
+			raise GitError('truncated object')
+		result.append(d.decompress(chunk))
+		offset += len(chunk)
+	return b''.join(result)
+
+def _varint(delta, i):
+	result = 0
+	shift = 0
+	while True:
+		c = delta[i]
+		i += 1
+		result |= (c & 0x7f) << shift
+		shift += 7
+		if not c & 0x80:
+			return (result, i)
+
+def _applyDelta(base, delta):
+	srcSize, i = _varint(delta, 0)
+	dstSize, i = _varint(delta, i)
+	if srcSize != len(base):
+		raise GitError('invalid delta')
+	result = []
+	while i < len(delta):
+		c = delta[i]
+		i += 1
+		if c & 0x80:
+			offset = 0
+			size = 0
+			for bit in range(4):
+				if c & (1 << bit):
+					offset |= delta[i] << (8*bit)
+					i += 1
+			for bit in range(3):
+				if c & (1 << (4+bit)):
+					size |= delta[i] << (8*bit)
+					i += 1
+			if size == 0:
+				size = 0x10000
+			result.append(base[offset:offset+size])
+		elif c:
+			result.append(delta[i:i+c])
+			i += c
+		else:
+			raise GitError('invalid delta')
+	result = b''.join(result)
+	if len(result) != dstSize:
+		raise GitError('invalid delta')
+	return result
+
+class Repository(object):
+	"""A git repository (or worktree) containing path"""
+
+	def __init__(self, path):
+		path = os.path.abspath(path)
+		while True:
+			candidate = os.path.join(path, '.git')
+			self.workDir = path
+			if os.path.isdir(candidate):
+				self.gitDir = candidate
+				break
+			if os.path.isfile(candidate):
+				# Worktrees and submodules
+				content = _readText(candidate)
+				if not content.startswith('gitdir:'):
+					raise GitError('invalid .git file')
+				self.gitDir = os.path.join(path, content[7:].strip())
+				break
+			parent = os.path.dirname(path)
+			if parent == path:
+				raise GitError('not a git repository')
+			path = parent
+
+		self.commonDir = self.gitDir
+		if os.path.exists(os.path.join(self.gitDir, 'commondir')):
+			self.commonDir = os.path.normpath(os.path.join(self.gitDir,
+				_readText(os.path.join(self.gitDir, 'commondir'))))
+
+		if os.path.exists(os.path.join(self.commonDir, 'shallow')) \
+				or os.path.exists(os.path.join(self.commonDir, 'objects', 'info', 'alternates')):
+			raise GitError('shallow clones and alternates are not supported')
+
+		self.objectsDir = os.path.join(self.commonDir, 'objects')
+		self._packs = None
+		self._packedRefs = None
+
+	def packs(self):
+		if self._packs is None:
+			packDir = os.path.join(self.objectsDir, 'pack')
+			try:
+				files = sorted(os.listdir(packDir))
+			except OSError:
+				files = []
+			self._packs = [_Pack(os.path.join(packDir, f)) for f in files if f.endswith('.idx')]
+		return self._packs
+
+	def packedRefs(self):
+		"""Returns {ref: (sha, peeled sha)}"""
+		if self._packedRefs is None:
+			self._packedRefs = dict()
+			try:
+				lines = _readText(os.path.join(self.commonDir, 'packed-refs')).splitlines()
+			except IOError:
+				lines = []
+			last = None
+			for line in lines:
+				if line.startswith('#'):
+					continue
+				if line.startswith('^'):
+					if last:
+						self._packedRefs[last] = (self._packedRefs[last][0], line[1:].strip())
+					continue
+				sha, last = line.split(None, 1)
+				self._packedRefs[last] = (sha, None)
+		return self._packedRefs
+
+	def _refFile(self, ref):
+		# HEAD and other per worktree refs are stored in gitDir
+		for d in [self.gitDir, self.commonDir]:
+			fileName = os.path.join(d, ref)
+			if os.path.isfile(fileName):
+				return fileName
+		return None
+
+	def resolve(self, ref):
+		"""Returns the sha of a (symbolic) reference"""
+		for i in range(10):
+			fileName = self._refFile(ref)
+			if fileName:
+				content = _readText(fileName)
+			elif ref in self.packedRefs():
+				content = self.packedRefs()[ref][0]
+			else:
+				raise GitError('unknown reference %s' % ref)
+
+			if not content.startswith('ref:'):
+				return content
+			ref = content[4:].strip()
+		raise GitError('too many symbolic references')
+
+	def readObject(self, sha):
+		"""Returns (type, content) of an object"""
+		fileName = os.path.join(self.objectsDir, sha[:2], sha[2:])
+		if os.path.isfile(fileName):
+			data = zlib.decompress(_read(fileName))
+			header, content = data.split(b'\0', 1)
+			return (header.split()[0].decode('ascii'), content)
+
+		binSha = binascii.unhexlify(sha)
+		for pack in self.packs():
+			i = pack.find(binSha)
+			if i is not None:
+				return pack.read(self, i)
+
+		raise GitError('object %s not found' % sha)
+
+	def _headers(self, sha):
+		"""Returns the header lines of a commit or tag object"""
+		objType, content = self.readObject(sha)
+		headers = content.split(b'\n\n', 1)[0].decode('utf-8', 'replace')
+		return (objType, [line.split(' ', 1) for line in headers.splitlines() if ' ' in line])
+
+	def commit(self, sha):
+		"""Returns (commit time, parents) of a commit"""
+		objType, headers = self._headers(sha)
+		if objType != 'commit':
+			raise GitError('%s is not a commit' % sha)
+		parents = [h[1] for h in headers if h[0] == 'parent']
+		committer = [h[1] for h in headers if h[0] == 'committer']
+		time = int(committer[0].rsplit(' ', 2)[1]) if committer else 0
+		return (time, parents)
+
+	def _tagRefs(self):
+		tags = dict((ref, shas) for ref, shas in self.packedRefs().items()
+			if ref.startswith('refs/tags/'))
+		tagDir = os.path.join(self.commonDir, 'refs', 'tags')
+		for root, dirs, files in os.walk(tagDir):
+			for f in files:
+				ref = os.path.relpath(os.path.join(root, f), self.commonDir).replace(os.sep, '/')
+				tags[ref] = (_readText(os.path.join(root, f)), None)
+		return tags
+
+	def tags(self):
+		"""Returns {commit sha: (tag name, tagger time)} of all annotated tags"""
+		result = dict()
+		for ref, (sha, peeled) in self._tagRefs().items():
+			objType, headers = self._headers(sha)
+			if objType != 'tag':
+				# Lightweight tags are ignored by git describe
+				continue
+			target = [h[1] for h in headers if h[0] == 'object'][0]
+			tagger = [h[1] for h in headers if h[0] == 'tagger']
+			time = int(tagger[0].rsplit(' ', 2)[1]) if tagger else 0
+			name = ref[len('refs/tags/'):]
+			if target not in result or result[target][1] < time:
+				result[target] = (name, time)
+		return result
+
+	def abbrev(self, sha):
+		"""Abbreviates sha like git"""
+		count = sum(p.count for p in self.packs())
+		length = 7
+		if count:
+			length = max(7, (count.bit_length() + 1) // 2)
+		binSha = binascii.unhexlify(sha)
+		while length < 40:
+			matches = sum(p.prefixMatches(binSha, length) for p in self.packs())
+			looseDir = os.path.join(self.objectsDir, sha[:2])
+			if os.path.isdir(looseDir):
+				matches += sum(1 for f in os.listdir(looseDir) if (sha[:2]+f).startswith(sha[:length]))
+			if matches <= 1:
+				break
+			length += 1
+		return sha[:length]
+
+	def describe(self, maxCommits=10000, candidates=10):
+		"""Same as git describe --always (uses the algorithm of git)"""
+		head = self.resolve('HEAD')
+		tags = self.tags()
+		if head in tags:
+			return tags[head][0]
+
+		# Commits are processed by commit date like in git; each candidate
+		# tag has a flag that is propagated to all its ancestors
+		seenFlag = 1
+		flags = {head: seenFlag}
+		queue = _DateQueue()
+		queue.push(head, self.commit(head)[0])
+		matches = [] # [name, depth, flag, found order]
+		seen = 0
+		gaveUpOn = None
+
+		def addParents(sha):
+			for parent in self.commit(sha)[1]:
+				if not flags.get(parent, 0) & seenFlag:
+					queue.push(parent, self.commit(parent)[0])
+				flags[parent] = flags.get(parent, 0) | flags[sha]
+
+		while queue:
+			sha = queue.pop()
+			seen += 1
+			if seen > maxCommits:
+				raise GitError('history too long')
+			if sha in tags:
+				if len(matches) < candidates:
+					flag = 1 << (len(matches) + 1)
+					matches.append([tags[sha][0], seen - 1, flag, len(matches) + 1])
+					flags[sha] |= flag
+				else:
+					gaveUpOn = sha
+					break
+			for m in matches:
+				if not flags[sha] & m[2]:
+					m[1] += 1
+			# Stop if the last remaining path is already covered by the best candidates
+			if matches and not queue:
+				bestDepth = min(m[1] for m in matches)
+				bestWithin = 0
+				for m in matches:
+					if m[1] == bestDepth:
+						bestWithin |= m[2]
+				if flags[sha] & bestWithin == bestWithin:
+					break
+			addParents(sha)
+
+		if not matches:
+			return self.abbrev(head)
+
+		matches.sort(key=lambda m: (m[1], m[3]))
+		best = matches[0]
+
+		# Count the remaining commits not reachable from the best tag
+		if gaveUpOn:
+			queue.push(gaveUpOn, self.commit(gaveUpOn)[0])
+		while queue:
+			sha = queue.pop()
+			seen += 1
+			if seen > maxCommits:
+				raise GitError('history too long')
+			if flags[sha] & best[2]:
+				if all(flags[other] & best[2] for other in queue.shas()):
+					break
+			else:
+				best[1] += 1
+			addParents(sha)
+
+		return '%s-%d-g%s' % (best[0], best[1], self.abbrev(head))
+
+	def state(self):
+		"""Values that change if the result of describe or indexModified may change"""
+		tags = hashlib.sha1(repr(sorted(self._tagRefs().items())).encode('utf-8')).hexdigest()
+		return [_readText(os.path.join(self.gitDir, 'HEAD')), self.resolve('HEAD'), tags,
+			_stat(os.path.join(self.gitDir, 'index'))]
+
+	def _index(self):
+		"""Returns the entries of the index"""
+		data = _read(os.path.join(self.gitDir, 'index'))
+		if data[:4] != b'DIRC':
+			raise GitError('invalid index')
+		version, count = struct.unpack('>II', data[4:12])
+		if version not in [2, 3]:
+			raise GitError('unsupported index version %d' % version)
+
+		entries = []
+		offset = 12
+		for i in range(count):
+			fields = struct.unpack('>10I', data[offset:offset+40])
+			flags = struct.unpack('>H', data[offset+60:offset+62])[0]
+			pos = offset + 62
+			extended = 0
+			if flags & 0x4000:
+				extended = struct.unpack('>H', data[pos:pos+2])[0]
+				pos += 2
+			end = data.index(b'\0', pos)
+			entries.append(_IndexEntry(data[pos:end].decode('utf-8', 'surrogateescape'),
+				fields[6], fields[2], fields[3], fields[9], _hex(data[offset+40:offset+60]),
+				(flags >> 12) & 3, extended))
+			# Entries are padded with 1-8 NUL bytes
+			offset += ((end - offset) + 8) & ~7
+		return entries
+
+	def _tree(self, sha, prefix, result):
+		"""Adds all files of a tree to result ({path: (mode, sha)})"""
+		objType, content = self.readObject(sha)
+		i = 0
+		while i < len(content):
+			space = content.index(b' ', i)
+			nul = content.index(b'\0', space)
+			mode = int(content[i:space], 8)
+			name = prefix + content[space+1:nul].decode('utf-8', 'surrogateescape')
+			entrySha = _hex(content[nul+1:nul+21])
+			i = nul + 21
+			if mode == 0o40000:
+				self._tree(entrySha, name + '/', result)
+			else:
+				result[name] = (mode, entrySha)
+
+	def indexModified(self):
+		"""True if the index differs from HEAD (e.g. after git add)"""
+		objType, headers = self._headers(self.resolve('HEAD'))
+		tree = dict()
+		self._tree([h[1] for h in headers if h[0] == 'tree'][0], '', tree)
+
+		index = dict()
+		for e in self._index():
+			if e.stage or e.extended & _INTENT_TO_ADD:
+				return True
+			index[e.path] = (e.mode, e.sha)
+		return index != tree
+
+	def worktreeModified(self):
+		"""
+		True if a tracked file differs from the index. Like git, files are only
+		read if the stat data differs from the index or the file was modified
+		after the index was written.
+		"""
+		entries = self._index()
+		self._checkFilters(entries)
+
+		indexTime = os.stat(os.path.join(self.gitDir, 'index')).st_mtime_ns
+		for e in entries:
+			if e.extended & _SKIP_WORKTREE or e.mode == _MODE_GITLINK:
+				continue
+			fileName = os.path.join(self.workDir, e.path)
+			try:
+				st = os.lstat(fileName)
+			except OSError:
+				return True
+			if st.st_size & 0xffffffff == e.size and int(st.st_mtime) == e.mtime \
+					and (e.mtimeNs == 0 or st.st_mtime_ns % 1000000000 == e.mtimeNs) \
+					and st.st_mtime_ns < indexTime:
+				continue
+
+			if stat.S_ISLNK(st.st_mode):
+				content = os.readlink(fileName).encode('utf-8', 'surrogateescape')
+			else:
+				content = _read(fileName)
+			blob = hashlib.sha1(b'blob ' + str(len(content)).encode('ascii') + b'\0' + content)
+			if blob.hexdigest() != e.sha:
+				return True
+		return False
+
+	def _checkFilters(self, entries):
+		"""Files are compared without filters (raises GitError if filters may be used)"""
+		config = os.path.join(self.commonDir, 'config')
+		if os.path.exists(config) and re.search(r'^\s*autocrlf\s*=\s*(true|input)',
+				_readText(config), re.IGNORECASE | re.MULTILINE):
+			raise GitError('core.autocrlf is not supported')
+		attributes = [os.path.join(self.workDir, e.path) for e in entries
+			if os.path.basename(e.path) == '.gitattributes']
+		attributes.append(os.path.join(self.commonDir, 'info', 'attributes'))
+		for fileName in attributes:
+			if os.path.exists(fileName) and re.search(r'\b(filter|eol|text|ident)\b', _readText(fileName)):
+				raise GitError('attributes are not supported')
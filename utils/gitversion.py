@@ -34,12 +34,16 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import json
+import os
 import subprocess
 import sys
+import zlib
 
 import SCons.Action
 
 import utils.checks
+import utils.gitrepo
 
 __version_build_template="""/*
 * This file is automatically generated by the build process
@@ -53,7 +57,56 @@ __version_build_template="""/*
 
 __gitversion = None
 
-def get(env):
+def _cacheFile(env):
+	return env.File('$CONFIGUREDIR/gitversion.json').abspath
+
+def _fastVersion(env, dirty):
+	"""Get the version without running git, returns None on failure"""
+	# utils.gitrepo requires Python 3 (bytes and nanosecond timestamps)
+	if sys.version_info[0] < 3:
+		return None
+
+	try:
+		repo = utils.gitrepo.Repository(env.Dir('#').abspath)
+		state = repo.state() + [bool(dirty)]
+
+		# Reuse the result if HEAD, the tags and the index did not change
+		cache = None
+		try:
+			with open(_cacheFile(env)) as f:
+				cache = json.load(f)
+			if cache['state'] != state or 'staged' not in cache:
+				cache = None
+		except (IOError, ValueError, KeyError):
+			cache = None
+
+		if cache is None:
+			cache = {'state': state, 'version': repo.describe(),
+				'staged': bool(dirty) and repo.indexModified()}
+			try:
+				if not os.path.exists(os.path.dirname(_cacheFile(env))):
+					os.makedirs(os.path.dirname(_cacheFile(env)))
+				with open(_cacheFile(env), 'w') as f:
+					json.dump(cache, f)
+			except (IOError, OSError):
+				pass
+
+		version = cache['version']
+		# Files in the worktree can change without touching the index
+		if dirty and (cache['staged'] or repo.worktreeModified()):
+			version += ' (modified)'
+	except (utils.gitrepo.GitError, IOError, OSError, ValueError, zlib.error):
+		return None
+
+	return version
+
+def get(env, fast=False, dirty=True):
+	"""
+	Returns the output of git describe.
+	With fast, the repository is read directly without running git (falls
+	back to git for unsupported repositories, e.g. with clean/smudge
+	filters, and on Python 2).
+	"""
 	if env.GetOption('help') or env.GetOption('clean'):
 		return
 
@@ -61,6 +114,11 @@ def get(env):
 	if __gitversion:
 		return __gitversion
 
+	if fast:
+		__gitversion = _fastVersion(env, dirty)
+		if __gitversion:
+			return __gitversion
+
 	conf = env.Configure()
 	utils.checks.addDefaultTests(conf)
 
@@ -74,7 +132,10 @@ def get(env):
 			'stderr' : subprocess.PIPE,
 			'universal_newlines' : True,
 		}
-		p = SCons.Action._subproc(env, ['git', 'describe', '--dirty= (modified)', '--always'], **kw)
+		cmd = ['git', 'describe', '--always']
+		if dirty:
+			cmd.append('--dirty= (modified)')
+		p = SCons.Action._subproc(env, cmd, **kw)
 		out,err = p.communicate()
 		status = p.wait()
 		if err:
@@ -88,18 +149,20 @@ def get(env):
 		conf.Finish()
 		return __gitversion
 
-def generateHeader(env, target='version.h'):
-	version = get(env)
+def generateHeader(env, target='version.h', **kw):
+	"""Generates the version header, kw is passed to get()"""
+	version = get(env, **kw)
 
 	def createVersionFile(target, source, env):
-		"""Generate the version file with the current version in it"""
-		contents = __version_build_template % (version)
+		"""Generate the version file with the version stored in the source"""
+		contents = __version_build_template % (source[0].read())
 		fd = open(target[0].path, 'w')
 		fd.write(contents)
 		fd.close()
 		return 0
 
-	build_version = env.Command(target, [], SCons.Action.Action(createVersionFile))
-	env.AlwaysBuild(build_version)
+	# The header depends on the content of the version string only
+	# and is not rebuilt as long as the version does not change
+	build_version = env.Command(target, env.Value(version), SCons.Action.Action(createVersionFile))
 
 	return build_version
@@ -0,0 +1,108 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Results of libs.find().
+# A LibraryInfo contains the changes of a finder (flags), the result, and
+# where the result comes from. All successful results are kept in a registry
+# for the current run. Other environments with the same toolchain, search pathes
+# and finder arguments (e.g. debug and release variants) reuse the result
+# without probing.
+
+import SCons.Util
+
+import utils.envstate
+import utils.findcache
+import utils.linkorder
+
+# Variables that influence the search (flags like -O3 are ignored)
+_searchVariables = ['CPPPATH', 'LIBPATH']
+
+# Key -> LibraryInfo
+__registry = dict()
+
+class LibraryInfo(object):
+	def __init__(self, name, result, flags, provenance):
+		self.name = name
+		# Return value of the finder
+		self.result = result
+		# Changes of the construction variables (see utils.envstate)
+		self.flags = flags
+		# 'probe', 'cache', 'lockfile' or 'registry'
+		self.provenance = provenance
+
+	def __bool__(self):
+		return bool(self.result)
+	__nonzero__ = __bool__
+
+	def __repr__(self):
+		return '<LibraryInfo %s: %r (%s)>' % (self.name, self.result, self.provenance)
+
+	@property
+	def version(self):
+		if SCons.Util.is_Dict(self.result):
+			return self.result.get('version')
+		if SCons.Util.is_String(self.result):
+			return self.result
+		return None
+
+	@property
+	def features(self):
+		if SCons.Util.is_Dict(self.result):
+			return self.result.get('features', [])
+		return []
+
+	def apply(self, env):
+		"""Configures env (keeps the order of the libraries)"""
+		if not self.result:
+			return
+		utils.linkorder.begin(env)
+		for l in self.flags.get('LIBS', []):
+			utils.linkorder.require(env, l)
+		utils.envstate.apply(env, self.flags)
+		utils.linkorder.finalize(env)
+
+def lookup(env, lib, kw):
+	"""Returns the registry key and the LibraryInfo of a previous call (or None)"""
+	k = utils.findcache.fingerprint(env, lib, kw, _searchVariables)
+	info = __registry.get(k)
+	if info is not None:
+		info = LibraryInfo(info.name, info.result, info.flags, 'registry')
+	return (k, info)
+
+def register(key, info):
+	"""Keeps successful results for other environments"""
+	if info:
+		__registry[key] = info
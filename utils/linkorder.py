@@ -0,0 +1,186 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Dependency aware order of the libraries in LIBS.
+# Each environment gets a LinkOrder object (LINK_ORDER) that records an edge
+# from every library to all libraries added after it by the same finder (a
+# library must appear before the libraries it depends on). If a library is
+# added again, its earlier edges are dropped in case of conflicts (as when
+# linking statically, the last occurrence counts). finalize() replaces LIBS
+# with a topologically ordered list without duplicates.
+
+import heapq
+
+import SCons.Util
+
+import utils.transaction
+
+class LinkOrder(object):
+	def __init__(self):
+		# Key -> library (in the order of the first occurrence)
+		self._libs = dict()
+		self._index = dict()
+		# Key -> keys of the libraries that must appear later
+		self._deps = dict()
+		# Keys of the libraries added in the current group
+		self._group = []
+		# Keys of the libraries in LIBS (as list and as set) and the synced value of LIBS
+		self.synced = []
+		self.present = set()
+		self.source = None
+
+	def __semi_deepcopy__(self):
+		other = LinkOrder()
+		other._libs = dict(self._libs)
+		other._index = dict(self._index)
+		other._deps = dict((k, set(v)) for k, v in self._deps.items())
+		other._group = list(self._group)
+		other.synced = list(self.synced)
+		other.present = set(self.present)
+		return other
+
+	def __contains__(self, lib):
+		return str(lib) in self._libs
+
+	def begin(self):
+		"""Start a new group of libraries (no edges to the previous libraries)"""
+		self._group = []
+
+	def _reaches(self, start, goal):
+		stack = [start]
+		visited = set()
+		while stack:
+			k = stack.pop()
+			if k == goal:
+				return True
+			if k not in visited:
+				visited.add(k)
+				stack.extend(self._deps[k])
+		return False
+
+	def add(self, lib):
+		"""
+		Adds lib after all previous libraries of the group. If lib was added
+		before, it is moved (the last occurrence resolves the dependencies
+		when linking statically).
+		"""
+		key = str(lib)
+		if key not in self._libs:
+			self._libs[key] = lib
+			self._index[key] = len(self._index)
+			self._deps[key] = set()
+		for dependent in self._group:
+			if dependent != key and key not in self._deps[dependent]:
+				# Drop the earlier edges in case of conflicts
+				for d in list(self._deps[key]):
+					if self._reaches(d, dependent):
+						self._deps[key].discard(d)
+				self._deps[dependent].add(key)
+		if key not in self._group:
+			self._group.append(key)
+
+	def libs(self):
+		"""Returns all present libraries, each library before its dependencies"""
+		dependents = dict((k, 0) for k in self._libs)
+		for deps in self._deps.values():
+			for d in deps:
+				dependents[d] += 1
+
+		ready = [(self._index[k], k) for k, n in dependents.items() if n == 0]
+		heapq.heapify(ready)
+		result = []
+		while ready:
+			k = heapq.heappop(ready)[1]
+			if k in self.present:
+				result.append(self._libs[k])
+			for d in self._deps[k]:
+				dependents[d] -= 1
+				if dependents[d] == 0:
+					heapq.heappush(ready, (self._index[d], d))
+		return result
+
+def _libs(env):
+	libs = env.get('LIBS', [])
+	if not SCons.Util.is_List(libs):
+		libs = [libs]
+	return libs
+
+def get(env):
+	"""Returns the link order of env (includes all libraries in LIBS)"""
+	if 'LINK_ORDER' not in env:
+		env['LINK_ORDER'] = LinkOrder()
+	order = utils.transaction.writable(env, 'LINK_ORDER')
+	source = env.get('LIBS')
+	libs = _libs(env)
+	if source is order.source and len(libs) == len(order.synced):
+		# LIBS was not modified since the last call
+		return order
+
+	keys = [str(l) for l in libs]
+	if keys[:len(order.synced)] == order.synced:
+		# Libraries appended since the last call
+		for l in libs[len(order.synced):]:
+			order.add(l)
+		order.present.update(keys[len(order.synced):])
+	else:
+		for l in libs:
+			if l not in order:
+				order.add(l)
+		order.present = set(keys)
+	order.synced = keys
+	order.source = source
+	return order
+
+def begin(env):
+	"""Starts a new group, should be called before running a finder"""
+	get(env).begin()
+
+def require(env, lib):
+	"""Records that lib is required after the libraries added so far"""
+	get(env).add(lib)
+
+def contains(env, lib):
+	"""Checks whether lib is in LIBS"""
+	return str(lib) in get(env).present
+
+def finalize(env):
+	"""Replaces LIBS with the ordered list of libraries"""
+	order = get(env)
+	libs = order.libs()
+	if libs or 'LIBS' in env:
+		env['LIBS'] = libs
+		order.synced = [str(l) for l in libs]
+		order.source = env['LIBS']
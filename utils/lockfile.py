@@ -0,0 +1,172 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Lockfile with the configuration of libs.find() and the prefix pathes.
+# With --lockfile=FILE, a configure run writes all results into FILE (JSON,
+# sorted). If FILE exists, later runs use the results instead of running the
+# checks and warn if referenced headers or libraries changed. Use
+# --reconfigure to write a new lockfile. Results are stored per compiler
+# command, changed compilers are reported as warnings (the search pathes may
+# differ, e.g. on compute nodes). The file is only written if the
+# configuration and the build succeeded.
+
+import atexit
+import json
+import os
+
+import SCons.Script
+import SCons.Script.Main
+
+import utils.checks
+import utils.envstate
+import utils.findcache
+import utils.options
+
+# Content of the lockfile (None if not loaded yet)
+__content = None
+__fileName = None
+# Warnings already shown
+__warned = set()
+# True if the lockfile is written in this run
+__writing = False
+
+def _warn(msg):
+	utils.checks.display('warning: '+msg)
+
+def _warnOnce(msg):
+	if msg not in __warned:
+		__warned.add(msg)
+		_warn(msg)
+
+def _load(env):
+	global __content, __fileName, __writing
+	if __content is not None:
+		return __content
+
+	__content = dict()
+	option = utils.options.get('lockfile')
+	if not option:
+		return __content
+	__fileName = env.File(option).abspath
+
+	if os.path.exists(__fileName) and not utils.findcache.forced(env):
+		try:
+			with open(__fileName) as f:
+				__content = json.load(f)
+		except (IOError, ValueError) as e:
+			utils.checks.error('could not read %s: %s' % (__fileName, e))
+			env.Exit(1)
+		utils.checks.display('using configuration from %s' % __fileName)
+		_checkFiles(__content)
+	else:
+		__content = {'libs': dict(), 'prefixes': dict()}
+		__writing = True
+		atexit.register(_save)
+
+	return __content
+
+def _checkFiles(content):
+	"""Warns about headers and libraries that changed since the lockfile was written"""
+	files = dict()
+	for entry in content.get('libs', dict()).values():
+		files.update(entry.get('files', dict()))
+	for path in sorted(files.keys()):
+		stat = utils.findcache.fileStat(path)
+		if stat is None:
+			_warn('%s does not exist anymore' % path)
+		elif stat != files[path]:
+			_warn('%s changed since the lockfile was written' % path)
+
+def _save():
+	if SCons.Script.Main.exit_status or SCons.Script.GetBuildFailures():
+		_warn('configuration failed, %s not written' % __fileName)
+		return
+
+	try:
+		with open(__fileName+'.tmp', 'w') as f:
+			json.dump(__content, f, indent=1, sort_keys=True, separators=(',', ': '))
+			f.write('\n')
+		os.rename(__fileName+'.tmp', __fileName)
+	except (IOError, OSError) as e:
+		_warn('could not write %s: %s' % (__fileName, e))
+
+def reading(env):
+	"""True if results are taken from the lockfile"""
+	return bool(_load(env)) and not __writing
+
+def _libKey(toolchain, lib, kw):
+	return '%s(%s) [%s]' % (lib, ', '.join('%s=%r' % (k, kw[k]) for k in sorted(kw.keys())),
+		', '.join(t[0] for t in toolchain))
+
+def _checkToolchain(toolchain, entry):
+	"""Warns about compilers that changed since the lockfile was written"""
+	for t in toolchain:
+		if t not in entry.get('toolchain', []):
+			_warnOnce('%s changed since the lockfile was written' % (t[1] or t[0]))
+
+def lookupLib(env, lib, kw):
+	"""Returns (result, changes) of a finder call or None"""
+	if not reading(env):
+		return None
+	toolchain = utils.findcache.toolchain(env)
+	key = _libKey(toolchain, lib, kw)
+	entry = _load(env).get('libs', dict()).get(key)
+	if entry is None:
+		_warn('%s is not in the lockfile' % key)
+		return None
+	_checkToolchain(toolchain, entry)
+	return (entry['result'], utils.envstate.decode(entry['flags']))
+
+def storeLib(env, lib, kw, result, changes, files):
+	if not _load(env) or not __writing:
+		return
+	toolchain = utils.findcache.toolchain(env)
+	__content['libs'][_libKey(toolchain, lib, kw)] = {
+		'result': result,
+		'flags': utils.envstate.encode(changes),
+		'files': files,
+		'toolchain': toolchain}
+
+def lookupPrefixes(env, prefixes):
+	"""Returns the existing subdirectories of the prefixes or None"""
+	if not reading(env):
+		return None
+	return _load(env).get('prefixes', dict()).get(os.path.pathsep.join(prefixes))
+
+def storePrefixes(env, prefixes, subdirs):
+	if not _load(env) or not __writing:
+		return
+	__content['prefixes'][os.path.pathsep.join(prefixes)] = subdirs
@@ -0,0 +1,143 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Extracts version and feature macros of all supported libraries with a
+# single preprocessor run (-dM). The translation unit includes all version
+# headers available in the include path (requires __has_include). Finders
+# fall back to compile tests if a header was not included.
+
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+import threading
+
+import utils.profile
+
+# Headers that only contain macros (and are cheap to preprocess)
+# (parmetis.h is not included because it requires mpi.h)
+HEADERS = {
+	'C': ['H5pubconf.h', 'netcdf_meta.h', 'metis.h'],
+	'C++': ['H5pubconf.h', 'netcdf_meta.h', 'metis.h',
+		'Eigen/src/Core/util/Macros.h']
+}
+
+__lock = threading.Lock()
+# Preprocessor command -> macros
+__macros = dict()
+
+def _marker(header):
+	return 'SCONS_INCLUDED_' + re.sub('[^A-Za-z0-9]', '_', header).upper()
+
+def _source(headers):
+	lines = ['#ifdef __has_include']
+	for h in headers:
+		lines += ['#if __has_include(<%s>)' % h,
+			'#include <%s>' % h,
+			'#define %s 1' % _marker(h),
+			'#endif']
+	lines.append('#endif')
+	return '\n'.join(lines) + '\n'
+
+def _parse(output):
+	macros = dict()
+	for line in output.splitlines():
+		m = re.match(r'#define\s+([A-Za-z_][A-Za-z0-9_]*)(\([^)]*\))?\s*(.*)$', line)
+		if m and not m.group(2):
+			macros[m.group(1)] = m.group(3).strip()
+	return macros
+
+def get(env, language='C'):
+	"""
+	Returns all macros (name -> value) defined after including the version
+	headers or None if the preprocessor failed. The result is cached for
+	each compiler command line.
+	"""
+	if language in ['c++', 'C++', 'cpp', 'CXX', 'cxx']:
+		language = 'C++'
+		command = env.subst('$CXX $CXXFLAGS $CCFLAGS $_CCCOMCOM')
+		lang = 'c++'
+	else:
+		language = 'C'
+		command = env.subst('$CC $CFLAGS $CCFLAGS $_CCCOMCOM')
+		lang = 'c'
+
+	with __lock:
+		if command in __macros:
+			return __macros[command]
+
+	tempdir = env.Dir('$CONFIGUREDIR').abspath
+	if not os.path.exists(tempdir):
+		os.makedirs(tempdir)
+	fd, source = tempfile.mkstemp(suffix='.h', dir=tempdir)
+	try:
+		with os.fdopen(fd, 'w') as f:
+			f.write(_source(HEADERS[language]))
+		utils.profile.count()
+		p = subprocess.Popen(shlex.split(command) + ['-E', '-dM', '-x', lang, source],
+			env=env['ENV'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+			universal_newlines=True)
+		out = p.communicate()[0]
+		macros = _parse(out) if p.returncode == 0 else None
+	except OSError:
+		macros = None
+	finally:
+		os.remove(source)
+
+	with __lock:
+		__macros[command] = macros
+	return macros
+
+def included(macros, header):
+	"""Checks whether header was found by the preprocessor"""
+	return bool(macros) and _marker(header) in macros
+
+def value(macros, name):
+	"""Returns the value of a macro as string (quotes removed) or integer"""
+	v = macros.get(name, '')
+	if len(v) > 1 and v[0] == '"' and v[-1] == '"':
+		return v[1:-1]
+	m = re.match(r'^\(?(-?\d+)[uUlL]*\)?$', v)
+	if m:
+		return int(m.group(1))
+	return v
+
+def version(macros, names):
+	"""Returns the version from the macros in names (e.g. major, minor, patch) or None"""
+	if not all(n in macros for n in names):
+		return None
+	return '.'.join(str(value(macros, n)) for n in names)
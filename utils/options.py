@@ -0,0 +1,71 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Command line options of scons-tools.
+# The options are added by register(), which should be called once at the
+# beginning of the SConstruct. Without register(), get() returns the
+# default values.
+
+import SCons.Script
+
+_options = [
+	('--reconfigure', {'dest': 'reconfigure', 'action': 'store_true', 'default': False,
+		'help': 'ignore cached results of libs.find()'}),
+	('--lockfile', {'dest': 'lockfile', 'type': 'string', 'default': None, 'metavar': 'FILE',
+		'help': 'use the configuration stored in FILE (written if FILE does not exist)'}),
+	('--configure-profile', {'dest': 'configure_profile', 'type': 'string', 'default': None,
+		'metavar': 'FILE', 'help': 'write the timing of the configure checks to FILE and print a summary'})
+]
+
+__registered = False
+
+def register():
+	"""Adds the command line options (only once)"""
+	global __registered
+	if __registered:
+		return
+	for name, kw in _options:
+		SCons.Script.AddOption(name, **kw)
+	__registered = True
+
+def get(dest):
+	"""Returns the value of an option"""
+	if __registered:
+		return SCons.Script.GetOption(dest)
+	for name, kw in _options:
+		if kw['dest'] == dest:
+			return kw['default']
+	raise KeyError(dest)
@@ -0,0 +1,323 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# In-process replacement for pkg-config.
+# Parses .pc files found in PKG_CONFIG_PATH and the default search path and
+# resolves Requires/Requires.private recursively. Supported options are
+# --cflags, --libs and --static. Other options require the pkg-config binary.
+# Variables (e.g. prefix) are available with variable().
+
+import os
+import re
+import shlex
+import subprocess
+
+import utils.profile
+
+_supportedOptions = set(['--cflags', '--libs', '--static'])
+
+# Default search path if pkg-config is not available
+_defaultPath = ['/usr/local/lib/pkgconfig', '/usr/local/share/pkgconfig',
+	'/usr/lib/x86_64-linux-gnu/pkgconfig', '/usr/lib64/pkgconfig',
+	'/usr/lib/pkgconfig', '/usr/share/pkgconfig']
+
+# Search path -> {package -> .pc file}
+__indices = dict()
+# .pc file -> parsed package
+__packages = dict()
+# .pc file -> variables of the package
+__variables = dict()
+# Compiled in search path of pkg-config
+__systemPath = None
+
+class PcFileError(Exception):
+	pass
+
+def _systemPath(env):
+	"""Returns the default search path of pkg-config"""
+	global __systemPath
+	if __systemPath is None:
+		__systemPath = _defaultPath
+		pkgconfig = env.get('PKG_CONFIG') or env.WhereIs('pkg-config')
+		if pkgconfig:
+			try:
+				utils.profile.count()
+				p = subprocess.Popen([pkgconfig, '--variable', 'pc_path', 'pkg-config'],
+					env=env['ENV'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+					universal_newlines=True)
+				out = p.communicate()[0].strip()
+				if p.returncode == 0 and out:
+					__systemPath = out.split(os.path.pathsep)
+			except OSError:
+				pass
+	return __systemPath
+
+def _searchPath(env):
+	path = []
+	if env['ENV'].get('PKG_CONFIG_PATH'):
+		path.extend(env['ENV']['PKG_CONFIG_PATH'].split(os.path.pathsep))
+	if 'PKG_CONFIG_LIBDIR' in env['ENV']:
+		path.extend(env['ENV']['PKG_CONFIG_LIBDIR'].split(os.path.pathsep))
+	else:
+		path.extend(_systemPath(env))
+	return tuple(p for p in path if p)
+
+def index(env):
+	"""Returns a dictionary of all packages in the search path"""
+	path = _searchPath(env)
+	if path not in __indices:
+		packages = dict()
+		for d in path:
+			try:
+				files = os.listdir(d)
+			except OSError:
+				continue
+			for f in files:
+				if f.endswith('.pc') and f[:-3] not in packages:
+					packages[f[:-3]] = os.path.join(d, f)
+		__indices[path] = packages
+	return __indices[path]
+
+def _expand(value, variables, fileName):
+	def replace(m):
+		if m.group(0) == '$$':
+			return '$'
+		try:
+			return variables[m.group(1)]
+		except KeyError:
+			raise PcFileError('%s: undefined variable %s' % (fileName, m.group(1)))
+	return re.sub(r'\$\$|\$\{([^}]*)\}', replace, value)
+
+def load(fileName):
+	"""Parses a .pc file, returns the fields (lower case) with expanded variables"""
+	if fileName in __packages:
+		return __packages[fileName]
+
+	variables = {'pcfiledir': os.path.dirname(fileName)}
+	fields = dict()
+	with open(fileName) as f:
+		content = f.read().replace('\\\n', ' ')
+	for line in content.splitlines():
+		line = line.split('#', 1)[0].strip()
+		if not line:
+			continue
+		m = re.match(r'([A-Za-z0-9_.]+)\s*([:=])\s*(.*)$', line)
+		if not m:
+			continue
+		if m.group(2) == '=':
+			variables[m.group(1)] = _expand(m.group(3), variables, fileName)
+		else:
+			fields[m.group(1).lower()] = _expand(m.group(3), variables, fileName)
+
+	__packages[fileName] = fields
+	__variables[fileName] = variables
+	return fields
+
+def _versionKey(version):
+	return [(0, int(p)) if p.isdigit() else (1, p) for p in re.findall(r'\d+|[A-Za-z]+', version)]
+
+def _versionMatches(version, op, required):
+	a = _versionKey(version)
+	b = _versionKey(required)
+	return {'<': a < b, '<=': a <= b, '=': a == b, '!=': a != b,
+		'>=': a >= b, '>': a > b}[op]
+
+def _parseRequires(value):
+	"""Returns a list of (package, operator, version)"""
+	# Operators may be written without spaces (e.g. foo>=1.0)
+	tokens = re.findall(r'<=|>=|!=|[<>=]|[^\s,<>=!]+', value)
+	result = []
+	i = 0
+	while i < len(tokens):
+		if i + 2 < len(tokens) and tokens[i+1] in ['<', '<=', '=', '!=', '>=', '>']:
+			result.append((tokens[i], tokens[i+1], tokens[i+2]))
+			i += 3
+		else:
+			result.append((tokens[i], None, None))
+			i += 1
+	return result
+
+def _collect(packages, requirement, result, visited, private=True, last=False):
+	"""
+	Appends the required packages in the order of their first occurrence
+	(reversed order of the last occurrence if last is True)
+	"""
+	name, op, version = requirement
+	fileName = packages.get(name)
+	if not fileName:
+		raise PcFileError('package %s not found' % name)
+	fields = load(fileName)
+	if op and not _versionMatches(fields.get('version', ''), op, version):
+		raise PcFileError('%s %s %s required, found %s' % (name, op, version, fields.get('version', '')))
+
+	if name in visited:
+		return
+	visited.add(name)
+
+	requires = _parseRequires(fields.get('requires', ''))
+	if private:
+		requires.extend(_parseRequires(fields.get('requires.private', '')))
+	if last:
+		requires.reverse()
+	else:
+		result.append((name, fields))
+	for r in requires:
+		_collect(packages, r, result, visited, private, last)
+	if last:
+		result.append((name, fields))
+
+def _resolve(packages, lib, private=True, last=False):
+	"""
+	Returns all required packages, each package before its dependencies.
+	pkg-config repeats packages required several times. By default, the
+	order of the first occurrences is returned (used for cflags). With last,
+	the order of the last occurrences is returned (required for static
+	linking).
+	"""
+	result = []
+	_collect(packages, (lib, None, None), result, set(), private, last)
+	if last:
+		result.reverse()
+	return result
+
+def _systemDirs(env):
+	"""Include and library directories pkg-config removes from the output"""
+	incDirs = set(['/usr/include'])
+	libDirs = set(['/usr/lib', '/lib', '/usr/lib64', '/lib64'])
+	for p in _systemPath(env):
+		parent = os.path.dirname(p)
+		if os.path.basename(p) == 'pkgconfig' and parent.startswith('/usr/lib'):
+			libDirs.add(parent)
+	if 'PKG_CONFIG_ALLOW_SYSTEM_CFLAGS' in env['ENV']:
+		incDirs = set()
+	if 'PKG_CONFIG_ALLOW_SYSTEM_LIBS' in env['ENV']:
+		libDirs = set()
+	return (incDirs, libDirs)
+
+def flags(env, lib, opt):
+	"""
+	Returns the pkg-config output for lib as list of flags or None if the
+	options are not supported or lib is not in the search path (pkg-config
+	may still find it, e.g. with a sysroot).
+	"""
+	if not set(opt).issubset(_supportedOptions):
+		return None
+
+	packages = index(env)
+	if lib not in packages:
+		return None
+
+	static = '--static' in opt
+
+	# All required packages (dependencies after the packages depending on them)
+	result = _resolve(packages, lib)
+	# Packages only reachable via Requires.private do not contribute libs
+	libResult = _resolve(packages, lib, static, True)
+
+	incDirs, libDirs = _systemDirs(env)
+
+	output = []
+	if '--cflags' in opt:
+		for name, fields in result:
+			cflags = shlex.split(fields.get('cflags', ''))
+			if static:
+				cflags.extend(shlex.split(fields.get('cflags.private', '')))
+			for f in cflags:
+				if f.startswith('-I') and os.path.normpath(f[2:]) in incDirs:
+					continue
+				if f.startswith('-I') and f in output:
+					continue
+				output.append(f)
+	if '--libs' in opt:
+		for name, fields in libResult:
+			libs = shlex.split(fields.get('libs', ''))
+			if static:
+				libs.extend(shlex.split(fields.get('libs.private', '')))
+			for f in libs:
+				if f.startswith('-L') and os.path.normpath(f[2:]) in libDirs:
+					continue
+				if f.startswith('-L') and f in output:
+					continue
+				output.append(f)
+
+	return output
+
+def files(env, lib):
+	"""Returns the .pc files of lib and all required packages"""
+	packages = index(env)
+	result = []
+	try:
+		_collect(packages, (lib, None, None), result, set())
+	except (PcFileError, IOError):
+		pass
+	return [packages[name] for name, fields in result]
+
+def variable(env, lib, name):
+	"""Returns a variable of the .pc file of lib or None"""
+	packages = index(env)
+	if lib not in packages:
+		return None
+	try:
+		load(packages[lib])
+	except (PcFileError, IOError):
+		return None
+	return __variables[packages[lib]].get(name)
+
+def _unique(values, last=False):
+	"""Removes duplicates, keeps the first (or last) occurrence"""
+	values = [str(v) for v in values]
+	if last:
+		return list(reversed(_unique(reversed(values))))
+	seen = set()
+	return [v for v in values if not (v in seen or seen.add(v))]
+
+def equal(flags1, flags2):
+	"""
+	Compares parsed flags (see env.ParseFlags()) in order. Duplicates are
+	ignored, for LIBS the last occurrence counts (static link order).
+	"""
+	for key in set(flags1.keys()) | set(flags2.keys()):
+		last = key == 'LIBS'
+		if _unique(flags1.get(key, []), last) != _unique(flags2.get(key, []), last):
+			return False
+	return True
+
+def parse(env, lib, opt):
+	"""Same as flags() but returns the result of env.ParseFlags()"""
+	f = flags(env, lib, opt)
+	if f is None:
+		return f
+	return env.ParseFlags(f)
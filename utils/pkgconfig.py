@@ -34,17 +34,23 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import subprocess
+
 import utils.checks
+import utils.pcfile
+import utils.profile
 
 def CheckPkgconfig(context, lib, opt):
 	"""Run pkg-config and return parsed flags"""
 
 	context.Message('Checking whether pkg-config knows ' + lib + '... ')
+	utils.checks.addProbed('pcFiles', utils.pcfile.files(context.env, lib))
 
 	def parse_func(env, cmd):
 		return env.ParseFlags(cmd)
 
 	try:
+		utils.profile.count()
 		flags = context.env.ParseConfig([context.env['PKG_CONFIG'], '--silence-errors'] + opt + [lib], parse_func)
 	except OSError:
 		flags = False
@@ -52,19 +58,76 @@ def CheckPkgconfig(context, lib, opt):
 	context.Result(bool(flags))
 	return flags
 
+def CheckPcFile(context, lib, opt):
+	"""
+	Resolve the flags with the .pc files directly, returns None if pkg-config
+	is required
+	"""
+
+	context.Message('Checking whether pkg-config knows ' + lib + '... ')
+	utils.checks.addProbed('pcFiles', utils.pcfile.files(context.env, lib))
+
+	try:
+		flags = utils.pcfile.parse(context.env, lib, opt)
+	except (utils.pcfile.PcFileError, IOError):
+		flags = None
+
+	utils.checks.fresh(context)
+	if flags is None:
+		context.Result('unknown')
+	else:
+		context.Result(bool(flags))
+	return flags
 
 def parse(conf, lib, opt = ['--libs']):
-	"""Parses and returns options from pkg-config"""
+	"""
+	Parses and returns options from pkg-config
+	The .pc files are parsed in-process unless PKG_CONFIG_INTERNAL is False.
+	Set PKG_CONFIG_CROSSCHECK to compare the results with pkg-config.
+	"""
+
+	flags = None
+	if conf.env.get('PKG_CONFIG_INTERNAL', True):
+		conf.AddTest('CheckPcFile', CheckPcFile)
+		flags = conf.CheckPcFile(lib, opt)
+		if flags is not None and not conf.env.get('PKG_CONFIG_CROSSCHECK'):
+			return flags
 
 	if 'PKG_CONFIG' not in conf.env:
 		conf.AddTest('CheckProg', utils.checks.CheckProg)
 		conf.env['PKG_CONFIG'] = conf.CheckProg('pkg-config')
 
 	if not conf.env['PKG_CONFIG']:
-		return None
+		return flags
 
 	conf.AddTest('CheckPkgconfig', CheckPkgconfig)
-	return conf.CheckPkgconfig(lib, opt)
+	binaryFlags = conf.CheckPkgconfig(lib, opt)
+
+	if flags is not None and not utils.pcfile.equal(flags or {}, binaryFlags or {}):
+		utils.checks.display('warning: pkg-config and .pc parser disagree for %s: %s != %s'
+			% (lib, binaryFlags, flags))
+
+	return binaryFlags
+
+def variable(env, lib, name):
+	"""Returns a variable of a package (e.g. prefix) or None"""
+	if env.get('PKG_CONFIG_INTERNAL', True):
+		value = utils.pcfile.variable(env, lib, name)
+		if value is not None:
+			return value
+
+	if not env.get('PKG_CONFIG'):
+		return None
+	try:
+		utils.profile.count()
+		p = subprocess.Popen([env['PKG_CONFIG'], '--variable='+name, lib], env=env['ENV'],
+			stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+		out = p.communicate()[0]
+	except OSError:
+		return None
+	if p.returncode:
+		return None
+	return out.strip() or None
 
 def appendPathes(env, flags):
 	"""Add pathes found with pkgconfig or similar tools"""
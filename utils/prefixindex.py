@@ -0,0 +1,321 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Index of the files in include and library directories.
+# Directory listings are stored in $CONFIGUREDIR/prefixindex.json and reused
+# as long as the modification time of the directory does not change. Each
+# directory is checked at most once per run.
+# The default search pathes are queried from the compiler and the linker.
+
+import atexit
+import json
+import os
+import shlex
+import subprocess
+import threading
+
+import SCons.Util
+
+import utils.profile
+
+_libSuffixes = ['.so', '.a', '.dylib', '.tbd']
+
+__lock = threading.RLock()
+# Directory -> [mtime, files, subdirectories] (loaded on demand)
+__dirs = None
+# Directories checked in this run
+__checked = set()
+__modified = False
+__cacheFile = None
+# Compiler command -> (include pathes, library pathes)
+__compilerPathes = dict()
+
+def _load(env):
+	global __dirs, __cacheFile
+	if __dirs is None:
+		__dirs = dict()
+		__cacheFile = env.File('$CONFIGUREDIR/prefixindex.json').abspath
+		try:
+			with open(__cacheFile) as f:
+				for d, entry in json.load(f).items():
+					__dirs[d] = [entry[0], set(entry[1]), set(entry[2])]
+		except (IOError, ValueError, IndexError):
+			pass
+		atexit.register(_save)
+
+def _save():
+	if not __modified:
+		return
+	try:
+		if not os.path.exists(os.path.dirname(__cacheFile)):
+			os.makedirs(os.path.dirname(__cacheFile))
+		with open(__cacheFile+'.tmp', 'w') as f:
+			json.dump(dict((d, [e[0], sorted(e[1]), sorted(e[2])]) for d, e in __dirs.items()), f)
+		os.rename(__cacheFile+'.tmp', __cacheFile)
+	except (IOError, OSError):
+		pass
+
+def _scan(path):
+	"""Returns the files and subdirectories of path"""
+	files = set()
+	dirs = set()
+	if hasattr(os, 'scandir'):
+		for entry in os.scandir(path):
+			try:
+				if entry.is_dir():
+					dirs.add(entry.name)
+				else:
+					files.add(entry.name)
+			except OSError:
+				pass
+	else:
+		for name in os.listdir(path):
+			if os.path.isdir(os.path.join(path, name)):
+				dirs.add(name)
+			else:
+				files.add(name)
+	return (files, dirs)
+
+def listing(env, path):
+	"""Returns the files and subdirectories of path or None if path is not a directory"""
+	global __modified
+	path = os.path.abspath(path)
+	with __lock:
+		_load(env)
+		if path in __checked:
+			entry = __dirs.get(path)
+			return (entry[1], entry[2]) if entry else None
+
+		__checked.add(path)
+		try:
+			mtime = os.stat(path).st_mtime
+		except OSError:
+			if __dirs.pop(path, None):
+				__modified = True
+			return None
+		entry = __dirs.get(path)
+		if entry and entry[0] == mtime:
+			return (entry[1], entry[2])
+
+		try:
+			files, dirs = _scan(path)
+		except OSError:
+			return None
+		__dirs[path] = [mtime, files, dirs]
+		__modified = True
+		return (files, dirs)
+
+def exists(env, path, directory=False):
+	"""Checks whether a file (or directory) exists using the index"""
+	parent, name = os.path.split(os.path.abspath(path))
+	entry = listing(env, parent)
+	if not entry:
+		return False
+	return name in entry[1 if directory else 0]
+
+def findHeader(env, pathes, header):
+	"""Returns the first directory in pathes that contains the header or None"""
+	for p in pathes:
+		if exists(env, os.path.join(p, header)):
+			return p
+	return None
+
+def findLib(env, pathes, lib):
+	"""Returns the first directory in pathes that contains lib<lib>.{so,a} or None"""
+	for p in pathes:
+		entry = listing(env, p)
+		if entry and any('lib'+lib+s in entry[0] for s in _libSuffixes):
+			return p
+	return None
+
+def _run(env, cmd):
+	try:
+		utils.profile.count()
+		p = subprocess.Popen(cmd, env=env['ENV'], stdin=open(os.devnull),
+			stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+		out, err = p.communicate()
+	except OSError:
+		return None
+	if p.returncode:
+		return None
+	return (out, err)
+
+def _queryCompiler(env, cmd, lang):
+	"""Asks the compiler for its include and library pathes"""
+	incPathes = None
+	out = _run(env, cmd + ['-E', '-v', '-x', 'c++' if lang == 'C++' else 'c', os.devnull])
+	if out:
+		lines = out[1].splitlines()
+		try:
+			start = lines.index('#include <...> search starts here:')
+			end = lines.index('End of search list.')
+			incPathes = [os.path.normpath(l.strip().replace(' (framework directory)', ''))
+				for l in lines[start+1:end]]
+		except ValueError:
+			pass
+
+	libPathes = None
+	out = _run(env, cmd + ['-print-search-dirs'])
+	if out:
+		for line in out[0].splitlines():
+			if line.startswith('libraries: ='):
+				libPathes = [os.path.normpath(p) for p in line[12:].split(os.path.pathsep) if p]
+		# Compiler wrappers (e.g. mpicc) add -L flags when linking
+		link = _run(env, cmd + ['-###', '-o', os.devnull, 'conftest.o'])
+		if libPathes is not None and link:
+			for line in link[1].splitlines():
+				try:
+					args = shlex.split(line)
+				except ValueError:
+					continue
+				wrapper = [os.path.normpath(a[2:]) for a in args if a.startswith('-L') and len(a) > 2]
+				libPathes = [p for p in wrapper if p not in libPathes] + libPathes
+		# Pathes built into the linker
+		ld = _run(env, cmd + ['-print-prog-name=ld'])
+		ldOut = _run(env, [ld[0].strip(), '--verbose']) if ld else None
+		if libPathes is not None and ldOut:
+			for token in ldOut[0].split(';'):
+				token = token.strip()
+				if token.startswith('SEARCH_DIR("') and token.endswith('")'):
+					libPathes.append(os.path.normpath(token[12:-2].lstrip('=')))
+		elif libPathes is not None:
+			# Search pathes of the linker are unknown
+			libPathes = None
+
+	return (incPathes, libPathes)
+
+def compilerPathes(env, lang):
+	"""Returns the default (include, library) pathes of the compiler, None if unknown"""
+	if lang == 'C++':
+		command = env.subst('$CXX $CXXFLAGS $CCFLAGS')
+	else:
+		command = env.subst('$CC $CFLAGS $CCFLAGS')
+	key = (command, lang, env['ENV'].get('PATH'), env['ENV'].get('CPATH'),
+		env['ENV'].get('LIBRARY_PATH'))
+	with __lock:
+		if key not in __compilerPathes:
+			__compilerPathes[key] = _queryCompiler(env, shlex.split(command), lang)
+		return __compilerPathes[key]
+
+def _pathes(env, key):
+	result = []
+	for p in env.get(key, []):
+		if SCons.Util.is_String(p):
+			p = env.subst(p)
+		result.append(env.Dir(p).abspath)
+	return result
+
+def _flagPathes(env, flag):
+	"""Pathes passed as flag (e.g. -L) in LINKFLAGS"""
+	flags = env.get('LINKFLAGS', [])
+	if SCons.Util.is_String(flags):
+		flags = flags.split()
+	return [env.subst(str(f))[len(flag):] for f in flags if str(f).startswith(flag)]
+
+def includePathes(env, lang):
+	"""
+	All include pathes searched by the compiler (CPPPATH, pending prefixes
+	and the default pathes)
+	"""
+	return _pathes(env, 'CPPPATH') + _pathes(env, 'PREFIX_CPPPATH') + (compilerPathes(env, lang)[0] or [])
+
+def libPathes(env):
+	"""LIBPATH and the library pathes of pending prefixes (PREFIX_LIBPATH)"""
+	return _pathes(env, 'LIBPATH') + [p for p in _pathes(env, 'PREFIX_LIBPATH')
+		if p not in _pathes(env, 'LIBPATH')]
+
+def searchPathes(env, lang):
+	"""All library pathes searched by the linker (LIBPATH, -L and the default pathes)"""
+	return _pathes(env, 'LIBPATH') + _flagPathes(env, '-L') + (compilerPathes(env, lang)[1] or [])
+
+def libraryFile(env, lib, lang):
+	"""Returns the file the linker uses for -l<lib> or None if unknown"""
+	if compilerPathes(env, lang)[1] is None:
+		return None
+	for p in searchPathes(env, lang):
+		entry = listing(env, p)
+		if not entry:
+			continue
+		for s in _libSuffixes:
+			if 'lib'+lib+s in entry[0]:
+				return os.path.join(p, 'lib'+lib+s)
+	return None
+
+def _addPending(env, var, p):
+	env.AppendUnique(**{var: [p]})
+	if var == 'LIBPATH' and env.get('PREFIX_RPATH'):
+		env.AppendUnique(RPATH=[p])
+
+def checkHeaders(env, headers, lang):
+	"""
+	Checks whether all headers exist. Returns the first missing header or
+	None if all headers exist (or the search path is unknown).
+	Include directories of prefixes (PREFIX_CPPPATH) are added if required.
+	"""
+	pending = env.get('PREFIX_CPPPATH', [])
+	default = None
+	for header in headers:
+		if not header or os.path.isabs(header) or '..' in header.split('/'):
+			continue
+		if findHeader(env, _pathes(env, 'CPPPATH'), header):
+			continue
+		p = findHeader(env, pending, header)
+		if p:
+			_addPending(env, 'CPPPATH', p)
+			continue
+		if default is None:
+			default = compilerPathes(env, lang)[0] or False
+		if default is not False and not findHeader(env, default, header):
+			return header
+	return None
+
+def addLibPathes(env, libs):
+	"""
+	Adds library directories of prefixes (PREFIX_LIBPATH) that contain
+	one of the libraries. Libraries that are not found are not missing
+	(compiler wrappers add their own -L flags), only the link test decides.
+	"""
+	pending = env.get('PREFIX_LIBPATH', [])
+	if not pending:
+		return
+	for lib in libs:
+		if not lib or not SCons.Util.is_String(lib) or os.path.sep in lib or lib.startswith('-'):
+			continue
+		if findLib(env, _pathes(env, 'LIBPATH') + _flagPathes(env, '-L'), lib):
+			continue
+		p = findLib(env, pending, lib)
+		if p:
+			_addPending(env, 'LIBPATH', p)
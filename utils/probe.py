@@ -0,0 +1,250 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Lightweight replacement for SCons configure contexts. Tests run the
+# compiler directly (without the SConf/Node machinery), so several contexts
+# can be used concurrently from different threads. Output is buffered and
+# can be printed later in a deterministic order.
+
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+
+import SCons.Conftest
+import SCons.SConf
+import SCons.Util
+
+import utils.profile
+
+# Tests provided by SCons configure contexts
+_builtinTests = dict((name, getattr(SCons.SConf, name)) for name in
+	['CheckCC', 'CheckCXX', 'CheckFunc', 'CheckType', 'CheckTypeSize',
+	'CheckDeclaration', 'CheckHeader', 'CheckCHeader', 'CheckCXXHeader',
+	'CheckLib', 'CheckLibWithHeader', 'CheckProg']
+	if hasattr(SCons.SConf, name))
+
+def _split(cmd):
+	return shlex.split(cmd)
+
+class ProbeContext(object):
+	"""Implements the interface of SCons.SConf.CheckContext used by the tests"""
+
+	def __init__(self, conf):
+		self.sconf = conf
+		self.env = conf.env
+		self.did_show_result = 0
+		self.lastTarget = None
+		self.headerfilename = None
+		self.config_h = ''
+		self.havedict = dict()
+		self.vardict = dict()
+
+	def Message(self, text):
+		self.Display(text)
+		self.did_show_result = 0
+
+	def Result(self, res):
+		if SCons.Util.is_String(res):
+			text = res
+		elif res:
+			text = 'yes'
+		else:
+			text = 'no'
+
+		if self.did_show_result == 0:
+			self.Display(text + '\n')
+			self.did_show_result = 1
+
+	def Display(self, msg):
+		self.sconf.output.append(msg)
+		self.Log('scons: Configure: ' + msg + '\n')
+
+	def Log(self, msg):
+		self.sconf.log.append(msg)
+
+	def _build(self, text, extension, link):
+		"""Compiles (and links) text, returns the name of the target or None"""
+		env = self.env
+		cxx = extension in ['.cpp', '.cxx', '.cc', '.C']
+
+		self.sconf.counter += 1
+		base = os.path.join(self.sconf.tempdir, 'conftest_%d' % self.sconf.counter)
+		source = base + extension
+		with open(source, 'w') as f:
+			f.write(text)
+
+		if cxx:
+			cmd = env.subst('$CXX $CXXFLAGS $CCFLAGS $_CCCOMCOM')
+		else:
+			cmd = env.subst('$CC $CFLAGS $CCFLAGS $_CCCOMCOM')
+		if link:
+			target = base
+			cmd = cmd + ' ' + env.subst('$LINKFLAGS')
+			cmd = _split(cmd) + ['-o', target, source] + \
+				_split(env.subst('$_LIBDIRFLAGS $_RPATH $_LIBFLAGS'))
+		else:
+			target = base + env.subst('$OBJSUFFIX')
+			cmd = _split(cmd) + ['-c', '-o', target, source]
+
+		self.Log(' '.join(cmd) + '\n')
+		if self._run(cmd)[0]:
+			self.lastTarget = None
+			return None
+		self.lastTarget = target
+		return target
+
+	def _run(self, cmd):
+		try:
+			utils.profile.count()
+			p = subprocess.Popen(cmd, cwd=self.sconf.tempdir, env=self.env['ENV'],
+				stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+				universal_newlines=True)
+			output = p.communicate()[0]
+		except OSError as e:
+			self.Log(str(e) + '\n')
+			return (1, '')
+		self.Log(output)
+		return (p.returncode, output)
+
+	def TryCompile(self, text, extension):
+		return int(self._build(text, extension, False) is not None)
+
+	def TryLink(self, text, extension):
+		return int(self._build(text, extension, True) is not None)
+
+	def TryRun(self, text, extension):
+		target = self._build(text, extension, True)
+		if target is None:
+			return (0, '')
+		(status, output) = self._run([target])
+		return (int(status == 0), output)
+
+	def BuildProg(self, text, ext):
+		return not self.TryLink(text, ext)
+
+	def CompileProg(self, text, ext):
+		return not self.TryCompile(text, ext)
+
+	def CompileSharedObject(self, text, ext):
+		return not self.TryCompile(text, ext)
+
+	def RunProg(self, text, ext):
+		(res, output) = self.TryRun(text, ext)
+		return (not res, output)
+
+	def AppendLIBS(self, lib_name_list, unique=False):
+		oldLIBS = self.env.get('LIBS', [])
+		self.env.Append(LIBS=lib_name_list)
+		return oldLIBS
+
+	def PrependLIBS(self, lib_name_list, unique=False):
+		oldLIBS = self.env.get('LIBS', [])
+		self.env.Prepend(LIBS=lib_name_list)
+		return oldLIBS
+
+	def SetLIBS(self, val):
+		oldLIBS = self.env.get('LIBS', [])
+		self.env.Replace(LIBS=val)
+		return oldLIBS
+
+class _TestWrapper(object):
+	def __init__(self, test, conf):
+		self.test = test
+		self.conf = conf
+
+	def __call__(self, *args, **kw):
+		context = ProbeContext(self.conf)
+		ret = self.test(context, *args, **kw)
+		if not context.did_show_result:
+			context.Result('error: no result')
+		return ret
+
+class ProbeConf(object):
+	"""Replacement for SCons.SConf.SConf, returned by env.Configure() in probe mode"""
+
+	def __init__(self, env, tempbase, output, custom_tests={}):
+		self.env = env
+		self.output = output
+		self.log = []
+		self.counter = 0
+		self.tempdir = tempfile.mkdtemp(prefix='probe', dir=tempbase)
+		self.AddTests(_builtinTests)
+		self.AddTests(custom_tests)
+
+	def AddTest(self, test_name, test_instance):
+		setattr(self, test_name, _TestWrapper(test_instance, self))
+
+	def AddTests(self, tests):
+		for name in tests.keys():
+			self.AddTest(name, tests[name])
+
+	def Define(self, name, value=None, comment=None):
+		pass
+
+	def Finish(self):
+		shutil.rmtree(self.tempdir, True)
+		return self.env
+
+def enable(env, tempbase, confs, output):
+	"""
+	Replaces env.Configure with a function returning a ProbeConf.
+	All created contexts are added to confs, their output is appended to
+	output.
+	"""
+	def configure(env, custom_tests={}, *args, **kw):
+		conf = ProbeConf(env, tempbase, output, custom_tests)
+		confs.append(conf)
+		return conf
+
+	env.AddMethod(configure, 'Configure')
+
+def flush(env, confs, output):
+	"""
+	Displays the output, appends the log of confs to the configure log
+	and removes remaining temporary files.
+	"""
+	SCons.SConf.progress_display(''.join(output), append_newline=0)
+	for conf in confs:
+		shutil.rmtree(conf.tempdir, True)
+
+	try:
+		with open(env.File('$CONFIGURELOG').abspath, 'a') as f:
+			for conf in confs:
+				f.write(''.join(conf.log))
+	except IOError:
+		pass
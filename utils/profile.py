@@ -0,0 +1,196 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Profiling of the configure phase.
+# With --configure-profile=FILE, the wall time, the number of subprocesses
+# and cache hits of all checks (added with utils.checks.addDefaultTests) and
+# all libs.find() calls are recorded. At exit, a summary is printed and the
+# records are written to FILE (Chrome trace format, see chrome://tracing).
+# The subprocesses are the commands spawned by SCons during checks and
+# libs.find() and the ones started by the helpers of this package (see
+# count()). For libs.find(), hits and misses are taken from the provenance of
+# the result (see utils.libinfo). A check is a hit if SConf reported all its
+# results as cached.
+
+import atexit
+import contextlib
+import json
+import sys
+import threading
+import time
+
+import utils.options
+
+__lock = threading.Lock()
+__local = threading.local()
+__records = []
+__fileName = None
+__start = None
+
+def enabled():
+	global __fileName, __start
+	if __start is None:
+		__start = time.time()
+		__fileName = utils.options.get('configure_profile')
+		if __fileName:
+			atexit.register(_report)
+	return bool(__fileName)
+
+@contextlib.contextmanager
+def record(name, category='check', args=None):
+	"""
+	Records the time and the subprocesses of the block. The yielded record
+	can be modified (e.g. to set 'provenance').
+	"""
+	r = {'name': name, 'category': category, 'args': args,
+		'subprocesses': 0, 'provenance': None, 'cached': None,
+		'thread': threading.current_thread().ident}
+	if not enabled():
+		yield r
+		return
+
+	if not hasattr(__local, 'stack'):
+		__local.stack = []
+	__local.stack.append(r)
+	r['start'] = time.time()
+	try:
+		yield r
+	finally:
+		r['end'] = time.time()
+		__local.stack.pop()
+		if r['provenance'] is not None:
+			r['cached'] = r['provenance'] != 'probe'
+		with __lock:
+			__records.append(r)
+
+def count():
+	"""Counts a subprocess started by the current thread"""
+	for r in getattr(__local, 'stack', []):
+		r['subprocesses'] += 1
+
+def _countingSpawn(spawn):
+	def wrapper(*args, **kw):
+		count()
+		return spawn(*args, **kw)
+	wrapper._counting = True
+	return wrapper
+
+@contextlib.contextmanager
+def counting(env):
+	"""Counts the commands spawned by SCons for env (e.g. in configure tests)"""
+	spawn = env.get('SPAWN')
+	if not enabled() or spawn is None or getattr(spawn, '_counting', False):
+		yield
+		return
+
+	env['SPAWN'] = _countingSpawn(spawn)
+	try:
+		yield
+	finally:
+		env['SPAWN'] = spawn
+
+def _wrap(name, test):
+	def wrapper(context, *args, **kw):
+		with counting(context.env), record(name, args=[str(a) for a in args]) as r:
+			# SConf resets its cached flag when a result (a line) is displayed
+			cached = []
+			display = context.Display
+			def Display(msg):
+				if msg.endswith('\n'):
+					cached.append(bool(getattr(context.sconf, 'cached', 0)))
+				display(msg)
+			context.Display = Display
+			try:
+				return test(context, *args, **kw)
+			finally:
+				del context.Display
+				if cached:
+					r['cached'] = all(cached)
+	return wrapper
+
+def instrument(conf):
+	"""Records all tests added to the configure context"""
+	if not enabled() or getattr(conf, '_profiled', False):
+		return
+
+	addTest = conf.AddTest
+	def AddTest(name, test):
+		addTest(name, _wrap(name, test))
+	conf.AddTest = AddTest
+	conf._profiled = True
+
+def _summary(records):
+	"""
+	Total time, calls, subprocesses, hits and misses per name (slowest first).
+	Records without results (e.g. failed checks) are neither hits nor misses.
+	"""
+	total = dict()
+	for r in records:
+		t = total.setdefault((r['category'], r['name']), [0.0, 0, 0, 0, 0])
+		t[0] += r['end'] - r['start']
+		t[1] += 1
+		t[2] += r['subprocesses']
+		if r['cached'] is not None:
+			t[3 if r['cached'] else 4] += 1
+	return sorted(total.items(), key=lambda t: (-t[1][0], t[0]))
+
+def _trace(records):
+	threads = dict()
+	events = []
+	for r in sorted(records, key=lambda r: r['start']):
+		events.append({'name': r['name'], 'cat': r['category'], 'ph': 'X',
+			'ts': int((r['start'] - __start) * 1e6),
+			'dur': int((r['end'] - r['start']) * 1e6),
+			'pid': 0, 'tid': threads.setdefault(r['thread'], len(threads)),
+			'args': {'args': r['args'], 'subprocesses': r['subprocesses'],
+				'provenance': r['provenance'], 'cached': r['cached']}})
+	return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def _report():
+	with __lock:
+		records = list(__records)
+
+	lines = ['Configure profile:',
+		'%10s %6s %13s %6s %6s  %s' % ('time [s]', 'calls', 'subprocesses', 'hits', 'misses', 'name')]
+	for (category, name), t in _summary(records):
+		lines.append('%10.3f %6d %13d %6d %6d  %s' % (t[0], t[1], t[2], t[3], t[4], name))
+	sys.stdout.write('\n'.join(lines)+'\n')
+
+	try:
+		with open(__fileName, 'w') as f:
+			json.dump(_trace(records), f, indent=1, sort_keys=True)
+	except (IOError, OSError) as e:
+		sys.stderr.write('scons: warning: could not write %s: %s\n' % (__fileName, e))
@@ -0,0 +1,290 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Reads the dynamic symbol table of ELF shared libraries and the symbol
+# index of ar archives (pure Python, using mmap). Used to answer CheckLib
+# tests without linking a test program.
+
+import mmap
+import os
+import shlex
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+
+import utils.prefixindex
+import utils.profile
+
+_SHT_DYNAMIC = 6
+_SHT_DYNSYM = 11
+_SHT_GNU_VERSYM = 0x6fffffff
+
+_DT_NEEDED = 1
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+__lock = threading.Lock()
+# (path, mtime) -> parsed file
+__files = dict()
+# Compiler command -> machine of the objects created by the compiler
+__machines = dict()
+
+def _map(path):
+	"""Returns the content of path as mmap or None if it is empty"""
+	with open(path, 'rb') as f:
+		try:
+			return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:
+			return None
+
+def _string(data, offset):
+	end = data.find(b'\0', offset)
+	return data[offset:end].decode('utf-8', 'replace')
+
+def _parseElf(data):
+	"""Returns the machine, the exported symbols (name -> default version) and the dynamic entries"""
+	if data[:4] != b'\x7fELF' or data[4:5] not in (b'\x01', b'\x02'):
+		return None
+	is64 = data[4:5] == b'\x02'
+	e = '<' if data[5:6] == b'\x01' else '>'
+
+	if is64:
+		header = struct.unpack_from(e+'HHIQQQIHHHHHH', data, 16)
+		section, symbol, dynamic = 'IIQQQQIIQQ', 'IBBHQQ', 'qQ'
+	else:
+		header = struct.unpack_from(e+'HHIIIIIHHHHHH', data, 16)
+		section, symbol, dynamic = 'IIIIIIIIII', 'IIIBBH', 'iI'
+	machine = (is64, e, header[1])
+	shoff, shentsize, shnum = header[5], header[10], header[11]
+
+	sections = []
+	for i in range(shnum):
+		s = struct.unpack_from(e+section, data, shoff + i*shentsize)
+		# type, offset, size, link, entsize
+		sections.append((s[1], s[4], s[5], s[6], s[9]))
+
+	symbols = dict()
+	needed = []
+	runpath = []
+	versym = None
+	for s in sections:
+		if s[0] == _SHT_GNU_VERSYM:
+			versym = s
+	for s in sections:
+		if s[0] == _SHT_DYNSYM and s[4]:
+			strtab = sections[s[3]][1]
+			for i in range(s[2] // s[4]):
+				sym = struct.unpack_from(e+symbol, data, s[1] + i*s[4])
+				if is64:
+					name, info, other, shndx = sym[0], sym[1], sym[2], sym[3]
+				else:
+					name, info, other, shndx = sym[0], sym[3], sym[4], sym[5]
+				# Defined global/weak/unique symbols with default/protected visibility
+				if shndx == 0 or (info >> 4) not in (1, 2, 10) or (other & 3) not in (0, 3):
+					continue
+				default = True
+				if versym:
+					default = not (struct.unpack_from(e+'H', data, versym[1] + 2*i)[0] & 0x8000)
+				n = _string(data, strtab + name)
+				symbols[n] = symbols.get(n, False) or default
+		elif s[0] == _SHT_DYNAMIC and s[4]:
+			strtab = sections[s[3]][1]
+			for i in range(s[2] // s[4]):
+				tag, value = struct.unpack_from(e+dynamic, data, s[1] + i*s[4])
+				if tag == _DT_NEEDED:
+					needed.append(_string(data, strtab + value))
+				elif tag in (_DT_RPATH, _DT_RUNPATH):
+					runpath.extend(p for p in _string(data, strtab + value).split(':') if p)
+
+	return {'machine': machine, 'symbols': symbols, 'needed': needed, 'runpath': runpath}
+
+def _parseArchive(data):
+	"""Returns the symbols in the index of an archive or None"""
+	if data[:8] not in (b'!<arch>\n', b'!<thin>\n') or len(data) < 68:
+		return None
+	name = data[8:24].rstrip()
+	size = int(data[56:66])
+	if name == b'/':
+		width = 4
+	elif name == b'/SYM64/':
+		width = 8
+	else:
+		# No index or BSD format
+		return None
+
+	fmt = '>I' if width == 4 else '>Q'
+	count = struct.unpack_from(fmt, data, 68)[0]
+	names = data[68 + width*(count+1):68 + size].split(b'\0')
+	return {'symbols': set(n.decode('utf-8', 'replace') for n in names[:count])}
+
+def parse(path):
+	"""Returns the parsed ELF file or archive, None if the format is not supported"""
+	try:
+		key = (path, os.stat(path).st_mtime)
+	except OSError:
+		return None
+	with __lock:
+		if key in __files:
+			return __files[key]
+
+	result = None
+	try:
+		data = _map(path)
+		if data:
+			try:
+				if data[:4] == b'\x7fELF':
+					result = _parseElf(data)
+					if result:
+						result['type'] = 'elf'
+				else:
+					result = _parseArchive(data)
+					if result:
+						result['type'] = 'archive'
+			finally:
+				data.close()
+	except (IOError, OSError, struct.error, ValueError, IndexError):
+		result = None
+
+	with __lock:
+		__files[key] = result
+	return result
+
+def _compileMachine(env, cmd):
+	"""Compiles an empty object and returns its machine (False on failure)"""
+	tmpDir = tempfile.mkdtemp()
+	try:
+		source = os.path.join(tmpDir, 'conftest.c')
+		with open(source, 'w') as f:
+			f.write('int conftest;\n')
+		obj = os.path.join(tmpDir, 'conftest.o')
+		try:
+			utils.profile.count()
+			p = subprocess.Popen(cmd + ['-c', source, '-o', obj], env=env['ENV'],
+				stdin=open(os.devnull), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+			p.communicate()
+		except OSError:
+			return False
+		if p.returncode:
+			return False
+		try:
+			data = _map(obj)
+			if not data:
+				return False
+			try:
+				info = _parseElf(data)
+			finally:
+				data.close()
+		except (IOError, OSError, struct.error, ValueError, IndexError):
+			return False
+		return info['machine'] if info else False
+	finally:
+		shutil.rmtree(tmpDir, True)
+
+def _targetMachine(env, lang):
+	"""Returns the machine of the objects created by the compiler (False if unknown)"""
+	if lang == 'C++':
+		command = env.subst('$CXX $CXXFLAGS $CCFLAGS')
+	else:
+		command = env.subst('$CC $CFLAGS $CCFLAGS')
+	key = (command, lang, env['ENV'].get('PATH'))
+	with __lock:
+		if key not in __machines:
+			# Both languages use the same object format
+			cmd = shlex.split(command)
+			if lang == 'C++':
+				cmd += ['-x', 'c++']
+			__machines[key] = _compileMachine(env, cmd)
+		return __machines[key]
+
+def _dependenciesFound(env, path, lang, visited):
+	"""Checks whether all libraries required by the shared library path can be found"""
+	if path in visited:
+		return True
+	visited.add(path)
+
+	info = parse(path)
+	if not info or info['type'] != 'elf':
+		return False
+	origin = os.path.dirname(path)
+	dirs = [p.replace('$ORIGIN', origin).replace('${ORIGIN}', origin) for p in info['runpath']]
+	# The linker does not use LIBPATH for dependencies of shared libraries
+	dirs += [env.Dir(env.subst(str(p))).abspath for p in env.get('RPATH', [])]
+	for var in ['LD_RUN_PATH', 'LD_LIBRARY_PATH']:
+		dirs += [p for p in env['ENV'].get(var, '').split(os.path.pathsep) if p]
+	dirs += utils.prefixindex.compilerPathes(env, lang)[1] or []
+
+	for lib in info['needed']:
+		found = None
+		for d in dirs:
+			if utils.prefixindex.exists(env, os.path.join(d, lib)):
+				found = os.path.join(d, lib)
+				break
+		if not found or not _dependenciesFound(env, os.path.realpath(found), lang, visited):
+			return False
+	return True
+
+def defines(env, lib, symbol, lang):
+	"""
+	Checks whether linking with lib resolves symbol. Returns True or False
+	or None if a link test is required (e.g. the library is a linker script,
+	an archive, has a different architecture, exports only a non-default
+	version of the symbol or has missing dependencies).
+	"""
+	if '-static' in [str(f) for f in env.get('LINKFLAGS', [])]:
+		return None
+
+	path = utils.prefixindex.libraryFile(env, lib, lang)
+	if not path:
+		return None
+	info = parse(os.path.realpath(path))
+	if not info:
+		return None
+
+	if info['type'] == 'archive':
+		# Dependencies of archives are unknown
+		return False if symbol not in info['symbols'] else None
+
+	if info['machine'] != _targetMachine(env, lang):
+		return None
+	if symbol not in info['symbols']:
+		return False
+	if not info['symbols'][symbol]:
+		return None
+	if not _dependenciesFound(env, os.path.realpath(path), lang, set()):
+		return None
+	return True
@@ -0,0 +1,163 @@
+#! /usr/bin/python
+
+## @file
+# This file is part of scons-tools.
+#
+# @author Sebastian Rettenberger <sebastian.rettenberger@tum.de>
+#
+# @copyright Copyright (c) 2017, Technische Universitaet Muenchen.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Copy-on-write changes of construction environments.
+# A transaction records the original value of every construction variable
+# that is replaced (or deleted) in env. rollback() restores these values,
+# commit() keeps the changes. Unlike env.Clone(), only the modified variables
+# are copied. Dictionaries (e.g. ENV or CPPDEFINES) are modified in place by
+# SCons, they are copied when the transaction starts. Other values modified in
+# place (e.g. objects stored in env) are not detected automatically, they have
+# to be obtained with writable().
+# Transactions can be nested. Configure contexts (env.Configure()) created
+# inside a transaction must be finished before the transaction ends.
+
+import SCons.Util
+
+_missing = object()
+
+class _RecordingDict(dict):
+	"""Dictionary of the construction variables that notifies the transactions"""
+
+	def __init__(self, values):
+		dict.__init__(self, values)
+		self.transactions = []
+
+	def __semi_deepcopy__(self):
+		# Clones get a plain dictionary
+		return SCons.Util.semi_deepcopy_dict(self)
+
+	def _record(self, key):
+		for t in self.transactions:
+			if key not in t._saved:
+				t._saved[key] = dict.get(self, key, _missing)
+
+	def __setitem__(self, key, value):
+		self._record(key)
+		dict.__setitem__(self, key, value)
+
+	def __delitem__(self, key):
+		self._record(key)
+		dict.__delitem__(self, key)
+
+	def update(self, *args, **kw):
+		for key, value in dict(*args, **kw).items():
+			self[key] = value
+
+	def setdefault(self, key, default=None):
+		if key not in self:
+			self[key] = default
+		return dict.__getitem__(self, key)
+
+	def pop(self, key, *default):
+		if key in self:
+			self._record(key)
+		return dict.pop(self, key, *default)
+
+class Transaction(object):
+	"""
+	Records the changes of env until commit() or rollback() is called.
+	Can be used as context manager, the changes are rolled back unless
+	commit() was called.
+	"""
+
+	def __init__(self, env):
+		self.env = env
+		# Variable -> original value (_missing if not defined)
+		self._saved = dict()
+		self._active = True
+
+		if not isinstance(env._dict, _RecordingDict):
+			env._dict = _RecordingDict(env._dict)
+		env._dict.transactions.append(self)
+
+		# SCons updates dictionaries in place (e.g. AppendENVPath)
+		for key, value in list(env._dict.items()):
+			if type(value) is dict:
+				env._dict[key] = dict(value)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		if self._active:
+			self.rollback()
+
+	def changed(self):
+		"""Returns the names of the modified variables"""
+		result = []
+		for key, value in self._saved.items():
+			current = dict.get(self.env._dict, key, _missing)
+			if current is not value and (current is _missing or value is _missing or current != value):
+				result.append(key)
+		return sorted(result)
+
+	def _finish(self):
+		self._active = False
+		transactions = self.env._dict.transactions
+		transactions.remove(self)
+		if not transactions:
+			self.env._dict = dict(self.env._dict)
+
+	def commit(self):
+		"""Keeps all changes"""
+		self._finish()
+
+	def rollback(self):
+		"""Restores the original values of all modified variables"""
+		# Outer transactions have already recorded the original values
+		for key, value in self._saved.items():
+			if value is _missing:
+				dict.pop(self.env._dict, key, None)
+			else:
+				dict.__setitem__(self.env._dict, key, value)
+		self._finish()
+
+def begin(env):
+	"""Starts a new transaction for env"""
+	return Transaction(env)
+
+def writable(env, key):
+	"""
+	Returns env[key] for modifications in place. Inside a transaction, the
+	value is copied once (copy on write).
+	"""
+	value = env[key]
+	transactions = getattr(env._dict, 'transactions', None)
+	if transactions and any(key not in t._saved for t in transactions):
+		value = SCons.Util.semi_deepcopy(value)
+		env[key] = value
+	return value
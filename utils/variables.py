@@ -38,6 +38,8 @@ import os
 import SCons
 
 from . import checks
+from . import lockfile
+from . import prefixindex
 
 # Helper function for the prefix path variable
 def _pathListExists(key, value, env):
@@ -81,29 +83,45 @@ class Variables(SCons.Variables.Variables):
 		self.AddVariables(SCons.Script.PathVariable('cc', ccHint, None, SCons.Script.PathVariable.PathAccept),
 			SCons.Script.PathVariable('cxx', cxxHint, None, SCons.Script.PathVariable.PathAccept))
 
-	def SetPrefixPathes(self, env, binpath=False, rpath=True, pkgconfigpath=True):
-		"""Configures lib path, include path, bin path, rpath, pkgconfig path from the variable 'prefixPath'"""
+	def SetPrefixPathes(self, env, binpath=False, rpath=True, pkgconfigpath=True, lazy=False):
+		"""
+		Configures lib path, include path, bin path, rpath, pkgconfig path from the variable 'prefixPath'
+		With lazy, include and lib pathes are only added by the checks (utils.checks) if they contain
+		a required header or library.
+		"""
 		if not 'prefixPath' in env:
 			return
 
-		# Append include/lib and add them to the list if they exist
-		incPathes = [p for p in map(lambda p: os.path.join(p, 'include'), env['prefixPath']) if os.path.exists(p)]
-		libPathes = [p for p in map(lambda p: os.path.join(p, 'lib'), env['prefixPath']) if os.path.exists(p)]
+		# Existing subdirectories (from the lockfile if available)
+		subdirs = lockfile.lookupPrefixes(env, env['prefixPath'])
+		if subdirs is None:
+			def existing(subdir):
+				return [os.path.join(p, *subdir) for p in env['prefixPath'] \
+					if prefixindex.exists(env, os.path.join(p, *subdir), directory=True)]
+
+			subdirs = {'include': existing(['include']),
+				'lib': existing(['lib']),
+				'bin': existing(['bin']),
+				'pkgconfig': existing(['lib', 'pkgconfig']) + existing(['share', 'pkgconfig'])}
+			lockfile.storePrefixes(env, env['prefixPath'], subdirs)
 
-		env.AppendUnique(CPPPATH=incPathes)
-		env.AppendUnique(LIBPATH=libPathes)
+		# Append include/lib and add them to the list if they exist
+		incPathes = subdirs['include']
+		libPathes = subdirs['lib']
+
+		if lazy:
+			env.AppendUnique(PREFIX_CPPPATH=incPathes)
+			env.AppendUnique(PREFIX_LIBPATH=libPathes)
+			env['PREFIX_RPATH'] = rpath
+		else:
+			env.AppendUnique(CPPPATH=incPathes)
+			env.AppendUnique(LIBPATH=libPathes)
+			if rpath:
+				env.AppendUnique(RPATH=libPathes)
 		if binpath:
-			binPathes = [p for p in map(lambda p: os.path.join(p, 'bin'), env['prefixPath']) if os.path.exists(p)]
-			env.PrependENVPath('PATH', binPathes)
-		if rpath:
-			env.AppendUnique(RPATH=libPathes)
+			env.PrependENVPath('PATH', subdirs['bin'])
 		if pkgconfigpath:
-			pkgPathes = [p for p in map(lambda p: os.path.join(p, 'lib', 'pkgconfig'), env['prefixPath']) \
-					if os.path.exists(p)] + \
-				[p for p in map(lambda p: os.path.join(p, 'share', 'pkgconfig'), env['prefixPath']) \
-					if os.path.exists(p)]
-
-			env.PrependENVPath('PKG_CONFIG_PATH', pkgPathes)
+			env.PrependENVPath('PKG_CONFIG_PATH', subdirs['pkgconfig'])
 
 	def SetCompiler(self, env):
 		if 'cc' in env: